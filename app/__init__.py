@@ -1,19 +1,50 @@
-
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_cors import CORS
 from config import Config
+from .json_provider import FastJSONProvider
+from .database import configure_engine
+
+
+db = SQLAlchemy()
+
+
+def view_name(endpoint):
+    """'recipes.get_recipes' -> 'get_recipes': config tables (CACHE_CONTROL, RATE_LIMITS, ...) are keyed by view."""
+    return endpoint.rpartition('.')[2] if endpoint else endpoint
+
+
+def create_app(config=Config):
+    app = Flask(__name__)
+
+    app.config.from_object(config)
+
+    CORS(app)
+
+    app.json = FastJSONProvider(app)
+
+    db.init_app(app)
+
+    with app.app_context():
+        configure_engine(db.engine, app.config['SQLITE_PRAGMAS'])
+
+    from . import cache, passwords, response_cache, popular, ingredients, auth, http_cache, ratelimit, compression, commands
+    from .routes import main_bp, users_bp, recipes_bp, favorites_bp
 
-        
-app = Flask(__name__)
+    for module in (cache, passwords, response_cache, popular, ingredients, auth):
+        module.init_app(app)
 
-CORS(app)
+    # after_request hooks run in reverse: compression first, then metrics (compressed size), then Cache-Control
+    http_cache.init_app(app)
+    if app.config['METRICS_ENABLED']:
+        from . import metrics
+        metrics.init_app(app)
+    ratelimit.init_app(app)
+    compression.init_app(app)
 
-app.config.from_object(Config)
-    
-db = SQLAlchemy(app)
+    for blueprint in (main_bp, users_bp, recipes_bp, favorites_bp, commands.bp):
+        app.register_blueprint(blueprint)
+    # Flask-Migrate pulls in Alembic; only `flask db ...` needs it
+    app.cli.add_command(commands.LazyMigrateGroup(app))
 
-migrate = Migrate(app, db)
-    
-from . import routes, models, auth
\ No newline at end of file
+    return app
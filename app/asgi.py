@@ -0,0 +1,318 @@
+"""Async serving mode.
+
+    uvicorn app.asgi:application --workers 2
+
+The recipe, user and favorites endpoints run as async handlers on SQLAlchemy's
+async engine (aiosqlite / asyncpg) with the same handler bodies (app/handlers.py),
+token cache, response cache, ETags and Cache-Control as the Flask app. Every other
+route falls through to the Flask app.
+Needs the packages in requirements-async.txt.
+"""
+from contextlib import asynccontextmanager
+from functools import partial, wraps
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route, Mount
+
+from config import ENGINE_PROFILES, engine_profile
+from . import create_app, handlers, http_cache
+from .auth import authenticate, SAFE_METHODS
+from .compression import ENCODERS, negotiate, compression_level, compress_body, weak_etag
+from .database import configure_engine
+from .handlers import parse_recipe_list_args, parse_expand, recipe_list_query, project_recipe
+from .ratelimit import rate_limiter
+
+flask_app = create_app()
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def async_database_uri(uri):
+    scheme, rest = uri.split(':', 1)
+    return ASYNC_DRIVERS.get(scheme.split('+', 1)[0], scheme) + ':' + rest
+
+
+def make_engine(config):
+    uri = config['ASYNC_DATABASE_URI'] or async_database_uri(config['SQLALCHEMY_DATABASE_URI'])
+    options = dict(ENGINE_PROFILES.get(engine_profile(config['SQLALCHEMY_DATABASE_URI']), {}))
+    if 'pool_size' in options:
+        options['poolclass'] = AsyncAdaptedQueuePool
+    engine = create_async_engine(uri, **options)
+    configure_engine(engine.sync_engine, config['SQLITE_PRAGMAS'])
+    return engine
+
+
+engine = make_engine(flask_app.config)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+def json_response(payload, status=200):
+    return Response(flask_app.json.dumps_bytes(payload) + b'\n', status_code=status, media_type='application/json')
+
+
+def full_path(request):
+    # flask.Request.full_path, so both front ends derive the same ETags and cache keys
+    return f'{request.url.path}?{request.url.query}'
+
+
+async def current_user(request, session):
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    return await session.run_sync(authenticate, token, request.method not in SAFE_METHODS)
+
+
+def login_required(handler):
+    @wraps(handler)
+    async def wrapper(request):
+        # the token cache and the ORM events' caches are the Flask app's
+        with flask_app.app_context():
+            async with Session() as session:
+                user = await current_user(request, session)
+                if user is None:
+                    return json_response({'error': 'Incorrect token. Please try again'}, 401)
+                return await handler(request, session, user)
+    return wrapper
+
+
+def admitted(handler):
+    # Same RATE_LIMITS / CONCURRENCY_LIMITS as the Flask routes, keyed by the handler's name.
+    # The concurrency slot is freed when the handler returns, before a streamed body is sent.
+    @wraps(handler)
+    async def wrapper(request):
+        with flask_app.app_context():
+            refused = rate_limiter.admit(handler.__name__, request.headers.get('Authorization'),
+                                         request.client.host if request.client else None)
+            if refused:
+                error, status, retry_after = refused
+                response = json_response(error, status)
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+            try:
+                return await handler(request)
+            finally:
+                rate_limiter.release(handler.__name__)
+    return wrapper
+
+
+def cache_controlled(handler):
+    # CACHE_CONTROL policy of the Flask view with the handler's name (app/http_cache.py)
+    @wraps(handler)
+    async def wrapper(request):
+        response = await handler(request)
+        policy = http_cache.cache_control(handler.__name__, request.method, response.status_code, flask_app.config)
+        if policy and 'cache-control' not in response.headers:
+            response.headers['Cache-Control'] = policy
+        return response
+    return wrapper
+
+
+def cached(tags, vary=None):
+    """app.response_cache.cached for these handlers, in the same cache as the Flask app.
+    tags() and vary() get the handler's arguments."""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request, *args):
+            response_cache = flask_app.extensions['response_cache']
+            if not response_cache.enabled or http_cache.wants_stream(request.query_params, request.headers.get('accept')):
+                return await handler(request, *args)
+            key = request.state.response_cache_key = response_cache.key(
+                full_path(request), tags(request, *args), vary(request, *args) if vary else '')
+            replayed = response_cache.replay(key, request.headers.get('if-none-match'),
+                                             request.headers.get('if-modified-since'))
+            if replayed is not None:
+                status, headers, body = replayed
+                return Response(body, status_code=status, headers=headers)
+            response = await handler(request, *args)
+            if response.status_code == 200 and not isinstance(response, StreamingResponse):
+                response_cache.put(key, response.headers, response.body)
+            return response
+        return wrapper
+    return decorator
+
+
+async def conditional_response(request, states, build, *extra, last_modified=None):
+    """app.http_cache.conditional_response: a 304 without awaiting build() when the client's copy is current."""
+    headers, not_modified = http_cache.validators(full_path(request), states, *extra, last_modified=last_modified,
+                                                  if_none_match=request.headers.get('if-none-match'),
+                                                  if_modified_since=request.headers.get('if-modified-since'))
+    response = Response(status_code=304) if not_modified else json_response(await build())
+    response.headers.update(headers)
+    return response
+
+
+def compressed(handler):
+    # app/compression.py for these handlers: same negotiation, COMPRESSION_LEVELS and threshold,
+    # compressed bodies kept next to their response cache entry, weak ETags
+    @wraps(handler)
+    async def wrapper(request):
+        response = await handler(request)
+        level = compression_level(handler.__name__, request.method, response.status_code,
+                                  response.headers.get('content-type'), response.headers.get('content-encoding'),
+                                  flask_app.config)
+        if level is None:
+            return response
+        response.headers.append('Vary', 'Accept-Encoding')
+        encoding = negotiate(request.headers.get('accept-encoding'))
+        if encoding is None:
+            return response
+        if isinstance(response, StreamingResponse):
+            response.body_iterator = compress_async_stream(response.body_iterator, encoding, level)
+        else:
+            variant = partial(flask_app.extensions['response_cache'].variant,
+                              key=getattr(request.state, 'response_cache_key', None))
+            with flask_app.app_context():
+                body = compress_body(response.body, encoding, level, flask_app.config['COMPRESSION_MIN_SIZE'], variant)
+            if body is None:
+                return response
+            response.body = body
+            response.headers['content-length'] = str(len(body))
+        response.headers['content-encoding'] = encoding
+        if 'etag' in response.headers:
+            response.headers['etag'] = weak_etag(response.headers['etag'])
+        return response
+    return wrapper
+
+
+async def compress_async_stream(chunks, encoding, level):
+    compressor = ENCODERS[encoding](level)
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+# Recipes. The bodies are the Flask app's (app/handlers.py), run with AsyncSession.run_sync
+@cached(lambda request: ['recipes'])
+async def get_recipes(request):
+    parsed, error = parse_recipe_list_args(request.query_params)
+    if error:
+        return json_response(*error)
+    fields, expand, listing, limit = parsed
+
+    if http_cache.wants_stream(request.query_params, request.headers.get('accept')):
+        query = recipe_list_query(fields, expand, listing)
+        if limit is not None:
+            query = query.limit(limit)
+
+        async def generate():
+            async with Session() as session:
+                query_options = query.execution_options(yield_per=flask_app.config['RECIPES_YIELD_PER'])
+                rows = await (session.stream_scalars(query_options) if expand else session.stream(query_options))
+                async for row in rows:
+                    yield flask_app.json.dumps_bytes(project_recipe(row, fields, expand)) + b'\n'
+        response = StreamingResponse(generate(), media_type='application/x-ndjson')
+    else:
+        limit = handlers.page_size(limit)
+        async with Session() as session:
+            states = await session.run_sync(handlers.recipe_page_states, listing, limit)
+            response = await conditional_response(
+                request, states, lambda: session.run_sync(handlers.recipe_page, fields, expand, listing, limit))
+    response.headers.append('Vary', 'Accept')
+    return response
+
+
+@cached(lambda request: [f"recipe:{request.path_params['recipe_id']}"])
+async def get_recipe(request):
+    expand, error = parse_expand(request.query_params)
+    if error:
+        return json_response(*error)
+    recipe_id = request.path_params['recipe_id']
+    async with Session() as session:
+        state = await session.run_sync(handlers.recipe_state, recipe_id)
+        if state is None:
+            return json_response({'error': 'Recipe not found'}, 404)
+        return await conditional_response(
+            request, [state[:2]], lambda: session.run_sync(handlers.get_recipe, recipe_id, expand),
+            last_modified=state.updated_at)
+
+
+async def create_recipe(request):
+    data = await read_json(request)
+    if data is None:
+        return json_response({'error': 'Request must be in JSON format'}, 400)
+    async with Session() as session:
+        return json_response(*await session.run_sync(handlers.create_recipe, data))
+
+
+@login_required
+async def update_recipe(request, session, user):
+    data = await read_json(request) or {}
+    return json_response(*await session.run_sync(handlers.update_recipe, request.path_params['recipe_id'],
+                                                 data, user.user_id))
+
+
+@login_required
+async def delete_recipe(request, session, user):
+    return json_response(*await session.run_sync(handlers.delete_recipe, request.path_params['recipe_id'],
+                                                 user.user_id))
+
+
+# Users
+@login_required
+async def get_me(request, session, user):
+    return json_response(*await session.run_sync(handlers.get_user, user.user_id))
+
+
+@login_required
+async def get_user(request, session, user):
+    return json_response(*await session.run_sync(handlers.get_user, request.path_params['user_id']))
+
+
+# Favorites
+@login_required
+@cached(lambda request, session, user: ['recipes', f'favorites:{user.user_id}'],
+        vary=lambda request, session, user: user.user_id)
+async def get_favorites(request, session, user):
+    states = await session.run_sync(handlers.favorite_states, user.user_id)
+    return await conditional_response(
+        request, states, lambda: session.run_sync(handlers.get_favorites, user.user_id), user.user_id)
+
+
+@login_required
+async def toggle_favorite(request, session, user):
+    return json_response(*await session.run_sync(handlers.toggle_favorite, user.user_id,
+                                                 request.path_params['recipe_id']))
+
+
+@login_required
+async def remove_favorite(request, session, user):
+    return json_response(*await session.run_sync(handlers.remove_favorite, user.user_id,
+                                                 request.path_params['recipe_id']))
+
+
+@asynccontextmanager
+async def lifespan(application):
+    yield
+    await engine.dispose()
+
+
+application = Starlette(
+    routes=[
+        Route('/recipes', admitted(cache_controlled(compressed(get_recipes))), methods=['GET']),
+        Route('/recipes', admitted(create_recipe), methods=['POST']),
+        Route('/recipes/{recipe_id:int}', cache_controlled(compressed(get_recipe)), methods=['GET']),
+        Route('/recipes/{recipe_id:int}', update_recipe, methods=['PUT']),
+        Route('/recipes/{recipe_id:int}', delete_recipe, methods=['DELETE']),
+        Route('/users/me', get_me, methods=['GET']),
+        Route('/users/{user_id:int}', get_user, methods=['GET']),
+        Route('/favorites', cache_controlled(compressed(get_favorites)), methods=['GET']),
+        Route('/favorites/{recipe_id:int}', toggle_favorite, methods=['POST']),
+        Route('/favorites/{recipe_id:int}', remove_favorite, methods=['DELETE']),
+        # /token, bulk import, search, PUT/DELETE /users/me, ... stay on Flask
+        Mount('/', WSGIMiddleware(flask_app)),
+    ],
+    lifespan=lifespan,
+)
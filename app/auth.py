@@ -1,7 +1,11 @@
 
+from datetime import datetime, timezone
+from flask import request
 from flask_httpauth import HTTPBasicAuth, HTTPTokenAuth
 from . import db
-from .models import User
+from .cache import token_cache, Principal
+from .models import User, as_utc
+from .passwords import PasswordHashBusy
 from sqlalchemy import select
 
 
@@ -13,6 +17,9 @@ token_auth = HTTPTokenAuth()
 def verify(email, password):
     user = db.session.execute(select(User).where(User.email == email)).scalar_one_or_none()
     if user is not None and user.check_password(password):
+        if user.password_needs_rehash():
+            user.set_password(password)
+            db.session.commit()
         return user
     return None
 
@@ -21,14 +28,44 @@ def handle_error(status_code):
     return {'error': 'Incorrect username and/or password. Please try again'}, status_code
 
 
+# Requests that only read; anything else re-checks a cached token against the database
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def authenticate(session, token, recheck=False):
+    """Principal for a bearer token, or None. Shared with the ASGI app (app/asgi.py).
+
+    Reads with a cached token cost no query; routes that need the User load it themselves.
+    The cache is per worker and only the worker that deleted a user or rotated a token
+    drops it, so `recheck` (set for writes) confirms the token by primary key first.
+    """
+    principal = token_cache.get(token)
+    if principal is None:
+        row = session.execute(select(User.user_id, User.token_expiration).where(User.token==token)).first()
+        if row is None or row.token_expiration is None:
+            return None
+        principal = Principal(row.user_id, as_utc(row.token_expiration))
+        token_cache.set(token, principal)
+    elif recheck and session.scalar(select(User.token).where(User.user_id == principal.user_id)) != token:
+        token_cache.delete(token)
+        return None
+    if principal.token_expiration <= datetime.now(timezone.utc):
+        token_cache.delete(token)
+        return None
+    return principal
+
+
 @token_auth.verify_token
 def verify(token):
-    user = db.session.execute(select(User).where(User.token==token)).scalar_one_or_none()
-    # if user is not None and user.token_expiration > datetime.now(timezone.utc):
-    if user is not None:
-        return user
-    return None
+    return authenticate(db.session, token, recheck=request.method not in SAFE_METHODS)
 
 @token_auth.error_handler
 def handle_error(status_code):
     return {'error': 'Incorrect token. Please try again'}, status_code
+
+def handle_password_hash_busy(error):
+    return {'error': 'Too many logins in progress. Please try again shortly'}, 503, {'Retry-After': '1'}
+
+
+def init_app(app):
+    app.register_error_handler(PasswordHashBusy, handle_password_hash_busy)
@@ -0,0 +1,89 @@
+
+import time
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CacheBackend:
+    """Store for the response cache. Keys are str, values are bytes; a shared
+    backend must be safe to use from several worker processes."""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """Per-worker LRU, only safe with one worker: other workers' writes show up when entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize=10000, ttl=60):
+        self._cache = TTLCache(maxsize, ttl)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+
+# What token_auth.current_user() returns: routes that need more than the id load the User
+Principal = namedtuple('Principal', 'user_id token_expiration')
+
+
+def init_app(app):
+    app.extensions['token_cache'] = TTLCache(app.config['TOKEN_CACHE_SIZE'], app.config['TOKEN_CACHE_TTL'])
+
+
+# token -> Principal, filled by token_auth and dropped whenever the user changes.
+# Each app has its own, this is the current app's
+token_cache = LocalProxy(lambda: current_app.extensions['token_cache'])
@@ -0,0 +1,41 @@
+"""One set of session events for the in-process caches that follow committed ORM writes.
+
+Each cache registers a pair with on_committed_change(): after every flush collect(session, obj)
+returns what a new, changed or deleted object touched (recipe ids, cache tags, ...), and
+after the commit apply(keys) gets everything its collect() returned in the transaction.
+A rollback drops what was collected. Core-style writes (insert()/update() statements)
+bypass these events; their callers notify the caches themselves.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+HOOKS = []   # [(collect, apply)], in registration order
+
+
+def on_committed_change(collect, apply):
+    HOOKS.append((collect, apply))
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_changes(session, flush_context):
+    changes = session.info.setdefault('committed_changes', {})
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        for collect, _ in HOOKS:
+            keys = collect(session, obj)
+            if keys:
+                changes.setdefault(collect, set()).update(keys)
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_changes(session):
+    changes = session.info.pop('committed_changes', None)
+    if changes:
+        for collect, apply in HOOKS:
+            if changes.get(collect):
+                apply(changes[collect])
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_changes(session):
+    session.info.pop('committed_changes', None)
@@ -0,0 +1,74 @@
+
+import json
+import click
+from flask import Blueprint, current_app
+from . import db
+from .importer import import_recipes, parse_ndjson
+from .popular import reconcile_favorite_counts
+
+
+# cli_group=None: the commands are top level (`flask import-recipes`), not under `flask commands`
+bp = Blueprint('commands', __name__, cli_group=None)
+
+
+# flask import-recipes cookbook.ndjson [--user-id 1]
+@bp.cli.command('import-recipes')
+@click.argument('source', type=click.File('rb'))
+@click.option('--user-id', type=int, default=None, help='Owner of the imported recipes')
+def import_recipes_command(source, user_id):
+    """Bulk import recipes from a JSON array or NDJSON file."""
+    if source.name.endswith('.json'):
+        items = json.load(source)
+    else:
+        items = parse_ndjson(source)
+    report = import_recipes(items, user_id=user_id, chunk_size=current_app.config['BULK_IMPORT_CHUNK_SIZE'])
+    for error in report['errors']:
+        click.echo(f"recipe {error['index']}: {error['error']}", err=True)
+    click.echo(f"Imported {report['created']} recipes, {len(report['errors'])} failed")
+
+
+# flask reconcile-favorite-counts (safe to run from cron)
+@bp.cli.command('reconcile-favorite-counts')
+def reconcile_favorite_counts_command():
+    """Recount recipe.favorite_count from the favorite table."""
+    repaired = reconcile_favorite_counts()
+    click.echo(f"Repaired favorite_count on {repaired} recipes")
+
+
+# flask build-recommendations [--changed-only] [--workers 4] (e.g. nightly from cron, --changed-only hourly)
+@bp.cli.command('build-recommendations')
+@click.option('--changed-only', is_flag=True, help='Only recipes added or edited since their neighbours were computed')
+@click.option('--workers', type=int, default=None, help='Processes computing neighbours (default: one per CPU)')
+def build_recommendations_command(changed_only, workers):
+    """Precompute similar recipes and every user's recommendations."""
+    # imported when the command runs, like Flask-Migrate below
+    from .recommendations import build_recommendations
+    report = build_recommendations(changed_only=changed_only, workers=workers)
+    click.echo(f"Stored neighbours of {report['recipes']} recipes and recommendations for {report['users']} users")
+
+
+class LazyMigrateGroup(click.Group):
+    """`flask db ...` from Flask-Migrate, imported (with Alembic) only when the command runs."""
+
+    def __init__(self, app):
+        super().__init__('db', help='Perform database migrations.')
+        self.app = app
+
+    def load(self):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as migrate_group
+        if 'migrate' not in self.app.extensions:
+            Migrate(self.app, db)
+        return migrate_group
+
+    def get_params(self, ctx):
+        return self.load().get_params(ctx)
+
+    def list_commands(self, ctx):
+        return self.load().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self.load().get_command(ctx, name)
+
+    def invoke(self, ctx):
+        return self.load().invoke(ctx)
@@ -0,0 +1,128 @@
+import zlib
+from flask import current_app, request
+from werkzeug.http import parse_accept_header, quote_etag, unquote_etag
+from . import view_name
+from .response_cache import response_cache
+
+try:
+    import brotli
+except ImportError:  # optional, adds Content-Encoding: br
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional, adds Content-Encoding: zstd
+    zstandard = None
+
+
+class BrotliCompressor:
+    """brotli.Compressor behind the compress()/flush() interface of zlib's compressobj."""
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+# Content-Encoding -> compressor for a level on gzip's 1-9 scale, in order of preference.
+# Brotli's quality goes to 11, so levels are stretched to it; zstd takes them as they are
+ENCODERS = {}
+if brotli is not None:
+    ENCODERS['br'] = lambda level: BrotliCompressor(round(level * 11 / 9))
+if zstandard is not None:
+    ENCODERS['zstd'] = lambda level: zstandard.ZstdCompressor(level=level).compressobj()
+ENCODERS['gzip'] = lambda level: zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+ENCODERS['deflate'] = lambda level: zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS)   # zlib format, per RFC 9110
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+def negotiate(accept_encoding):
+    """The client's most preferred encoding we support (ties go to ENCODERS order), or None."""
+    return parse_accept_header(accept_encoding or '').best_match(list(ENCODERS))
+
+
+def compress(data, encoding, level):
+    compressor = ENCODERS[encoding](level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding, level):
+    compressor = ENCODERS[encoding](level)
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def route_level(endpoint, config=None):
+    config = config or current_app.config
+    return config['COMPRESSION_LEVELS'].get(endpoint, config['COMPRESSION_LEVEL'])
+
+
+def compressible(status_code, mimetype, content_encoding):
+    return (200 <= status_code < 300 and status_code not in (204, 206) and not content_encoding
+            and (mimetype or '').startswith(COMPRESSIBLE_TYPES))
+
+
+def compression_level(view, method, status_code, mimetype, content_encoding, config):
+    """The level to compress this response at, or None when it is sent as is (and doesn't vary on Accept-Encoding)."""
+    level = route_level(view, config)
+    if not config['COMPRESSION_ENABLED'] or not level or method == 'HEAD' \
+            or not compressible(status_code, mimetype, content_encoding):
+        return None
+    return level
+
+
+def compress_body(body, encoding, level, min_size, variant):
+    """body compressed, or None when it is under min_size. `variant` is ResponseCache.variant
+    for the response being served: a cached response keeps its compressed bodies next to it,
+    so hot payloads compress once."""
+    if len(body) < min_size:
+        return None
+    return variant(f'{encoding}:{level}', lambda: compress(body, encoding, level))
+
+
+def weak_etag(value):
+    # same entity, different bytes: the ETag turns weak (If-None-Match compares weakly)
+    etag, _ = unquote_etag(value)
+    return quote_etag(etag, weak=True) if etag else value
+
+
+# The ASGI app (app/asgi.py) compresses its responses with the helpers above as well
+def compress_response(response):
+    level = compression_level(view_name(request.endpoint), request.method, response.status_code,
+                              response.mimetype, response.content_encoding, current_app.config)
+    if level is None:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        # size unknown up front; NDJSON exports are large by design
+        response.response = compress_stream(response.response, encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = compress_body(response.get_data(), encoding, level, current_app.config['COMPRESSION_MIN_SIZE'],
+                             response_cache.variant)
+        if body is None:
+            return response
+        response.set_data(body)
+    response.content_encoding = encoding
+    if 'ETag' in response.headers:
+        response.headers['ETag'] = weak_etag(response.headers['ETag'])
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
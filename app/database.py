@@ -0,0 +1,22 @@
+
+from sqlalchemy import event, Text
+from sqlalchemy.ext.compiler import compiles
+
+
+# The models (and the first migration) declare TEXT(50)/TEXT(20), which SQLite
+# accepts but PostgreSQL rejects; PostgreSQL TEXT has no length.
+@compiles(Text, 'postgresql')
+def compile_text_without_length(type_, compiler, **kw):
+    return 'TEXT'
+
+
+def configure_engine(engine, sqlite_pragmas):
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in sqlite_pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
@@ -0,0 +1,103 @@
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from . import db
+from .models import Recipe, Favorite
+from .popular import popular_recipes
+from .response_cache import response_cache
+
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def validate_operation(data):
+    if not isinstance(data, dict):
+        return 'Each operation must be a JSON object'
+    if not isinstance(data.get('recipe_id'), int) or isinstance(data['recipe_id'], bool):
+        return 'recipe_id must be an integer'
+    if not isinstance(data.get('is_favorite', True), bool):
+        return 'is_favorite must be true or false'
+    return None
+
+
+def apply_favorites(user_id, operations):
+    """Apply [{recipe_id, is_favorite}] in order for one user; later operations on a recipe win.
+
+    Reads existing recipes and favorites with one IN query each and writes every change
+    with one upsert, one favorite_count UPDATE per direction and one commit.
+    """
+    report = {'updated': 0, 'results': []}
+    valid = []
+    for index, data in enumerate(operations):
+        error = validate_operation(data)
+        if error:
+            report['results'].append({'index': index, 'error': error})
+        else:
+            valid.append((index, data['recipe_id'], data.get('is_favorite', True)))
+    recipe_ids = {recipe_id for _, recipe_id, _ in valid}
+    if recipe_ids:
+        existing = set(db.session.scalars(select(Recipe.recipe_id).where(Recipe.recipe_id.in_(recipe_ids))))
+        initial = dict(db.session.execute(select(Favorite.recipe_id, Favorite.is_favorite).where(
+            Favorite.user_id == user_id, Favorite.recipe_id.in_(existing))).all()) if existing else {}
+    else:
+        existing, initial = set(), {}
+
+    state = dict(initial)   # no favorite row means not a favorite
+    for index, recipe_id, is_favorite in valid:
+        if recipe_id not in existing:
+            report['results'].append({'index': index, 'recipe_id': recipe_id, 'error': f'Recipe with ID {recipe_id} not found'})
+            continue
+        changed = state.get(recipe_id, False) != is_favorite
+        state[recipe_id] = is_favorite
+        report['results'].append({'index': index, 'recipe_id': recipe_id, 'is_favorite': is_favorite, 'changed': changed})
+    report['results'].sort(key=lambda result: result['index'])
+
+    changed = {recipe_id: is_favorite for recipe_id, is_favorite in state.items() if initial.get(recipe_id, False) != is_favorite}
+    if not changed:
+        return report
+    _write_favorites(user_id, changed, initial)
+    report['updated'] = len(changed)
+    return report
+
+
+def _write_favorites(user_id, changed, initial):
+    try:
+        insert = UPSERT_INSERTS[db.session.get_bind().dialect.name]
+        statement = insert(Favorite).values(
+            [{'user_id': user_id, 'recipe_id': recipe_id, 'is_favorite': is_favorite} for recipe_id, is_favorite in changed.items()])
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[Favorite.user_id, Favorite.recipe_id],
+            set_={'is_favorite': statement.excluded.is_favorite}))
+        # A recipe's count moves only when its favorite flips from or to true
+        added = [recipe_id for recipe_id, is_favorite in changed.items() if is_favorite]
+        removed = [recipe_id for recipe_id, is_favorite in changed.items() if not is_favorite and initial.get(recipe_id)]
+        for recipe_ids, delta in ((added, 1), (removed, -1)):
+            if recipe_ids:
+                db.session.execute(
+                    update(Recipe).where(Recipe.recipe_id.in_(recipe_ids)).values(favorite_count=Recipe.favorite_count + delta),
+                    execution_options={'synchronize_session': False})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    favorites_changed(user_id, changed)
+
+
+def favorites_changed(user_id, recipe_ids):
+    # Core-style writes bypass the ORM flush events the caches listen to; call after the commit
+    response_cache.invalidate(f'favorites:{user_id}')
+    popular_recipes.mark_dirty(recipe_ids)
+
+
+def remove_user_favorites(user_id):
+    """Delete a user's favorites and take them off favorite_count, in the caller's transaction.
+    Returns the recipes whose count went down."""
+    rows = db.session.execute(delete(Favorite).where(Favorite.user_id == user_id)
+                              .returning(Favorite.recipe_id, Favorite.is_favorite),
+                              execution_options={'synchronize_session': False})
+    recipe_ids = [recipe_id for recipe_id, is_favorite in rows if is_favorite]
+    if recipe_ids:
+        db.session.execute(
+            update(Recipe).where(Recipe.recipe_id.in_(recipe_ids)).values(favorite_count=Recipe.favorite_count - 1),
+            execution_options={'synchronize_session': False})
+    return recipe_ids
@@ -0,0 +1,200 @@
+"""Endpoint bodies shared by the Flask routes (app/routes.py) and the ASGI app (app/asgi.py).
+
+Nothing here touches flask.request: each function takes the (sync) SQLAlchemy session
+first and returns the payload or a (payload, status) pair. The Flask views pass
+db.session, the ASGI handlers run them on the async engine with AsyncSession.run_sync.
+Conditional GETs come in two parts, the states (recipe_id, version) that the ETag is
+computed from and the body, which is only built when it is needed.
+"""
+from flask import current_app
+from sqlalchemy import select, delete
+from .models import User, Recipe, Favorite
+from .favorites import UPSERT_INSERTS, favorites_changed
+from .importer import validate_recipe, validate_recipe_update
+from .listing import parse_listing
+
+
+def project_recipe(row, fields, expand=()):
+    data = {field: getattr(row, field) for field in fields}
+    for relationship in expand:
+        data[relationship] = [child.to_dict() for child in getattr(row, relationship)]
+    return data
+
+
+# `args` is flask.request.args or starlette's request.query_params
+def parse_recipe_list_args(args, user_id=None):
+    fields = args.get('fields')
+    if fields:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown_fields = [field for field in fields if field not in Recipe.FIELDS]
+        if unknown_fields:
+            return None, ({"error": f"Unknown fields: {', '.join(unknown_fields)}"}, 400)
+    else:
+        fields = list(Recipe.FIELDS)
+    expand, error = parse_expand(args)
+    if error:
+        return None, error
+    listing, error = parse_listing(args, user_id)
+    if error:
+        return None, error
+    try:
+        limit = int(args['limit']) if 'limit' in args else None
+    except ValueError:
+        return None, ({"error": "limit must be an integer"}, 400)
+    if limit is not None and limit < 1:
+        return None, ({"error": "limit must be a positive integer"}, 400)
+    return (fields, expand, listing, limit), None
+
+
+def recipe_list_query(fields, expand, listing):
+    if expand:
+        query = select(Recipe).options(*Recipe.expand_options(expand))
+    else:
+        query = select(*Recipe.columns(list(fields) + [f for f in listing.sort_fields if f not in fields]))
+    return query.where(*listing.conditions).order_by(*listing.order_by)
+
+
+# ?expand=ingredients,directions
+def parse_expand(args):
+    expand = [name.strip() for name in args.get('expand', '').split(',') if name.strip()]
+    unknown = [name for name in expand if name not in Recipe.EXPANDABLE]
+    if unknown:
+        return expand, ({"error": f"Cannot expand: {', '.join(unknown)}"}, 400)
+    return expand, None
+
+
+def page_size(limit):
+    return min(limit or current_app.config['RECIPES_PAGE_SIZE'], current_app.config['RECIPES_MAX_PAGE_SIZE'])
+
+
+# GET /recipes, GET /users/<user_id>/recipes
+def recipe_page_states(session, listing, limit):
+    # Only the page's (recipe_id, version) pairs, read through the same plan as the page itself,
+    # decide whether the body is needed at all. version is in no index, so rows are still visited
+    return session.execute(select(Recipe.recipe_id, Recipe.version)
+                           .where(*listing.conditions).order_by(*listing.order_by).limit(limit + 1)).all()
+
+
+def recipe_page(session, fields, expand, listing, limit):
+    query = recipe_list_query(fields, expand, listing).limit(limit + 1)
+    rows = session.scalars(query).all() if expand else session.execute(query).all()
+    next_cursor = listing.next_cursor(rows[limit - 1]) if len(rows) > limit else None
+    recipe_list = [project_recipe(row, fields, expand) for row in rows[:limit]]
+    return {"recipes": recipe_list, "next_cursor": next_cursor}
+
+
+# GET /recipes/<recipe_id>; updated_at is its Last-Modified
+def recipe_state(session, recipe_id):
+    return session.execute(select(Recipe.recipe_id, Recipe.version, Recipe.updated_at)
+                           .where(Recipe.recipe_id == recipe_id)).first()
+
+
+def get_recipe(session, recipe_id, expand):
+    return session.get(Recipe, recipe_id, options=Recipe.expand_options(expand)).to_dict(expand)
+
+
+def create_recipe(session, data):
+    error = validate_recipe(data)
+    if error:
+        return {"error": error}, 400
+    # Create the new recipe with its ingredients and directions, written by one flush
+    new_recipe = Recipe(
+        title=data['title'],
+        cook_time=data.get('cook_time'),
+        prep_time=data.get('prep_time'),
+        tips=data.get('tips', '')
+    )
+    try:
+        new_recipe.set_children(data['ingredients'], data.get('directions', []))
+    except ValueError as e:
+        # a new recipe has no children, so any ingredient_id/direction_id is unknown
+        return {"error": str(e)}, 400
+    try:
+        session.add(new_recipe)
+        session.commit()
+    except Exception:
+        session.rollback()
+        current_app.logger.exception('Could not create recipe %r', data['title'])
+        return {"error": "Could not create the recipe"}, 500
+    return {"success": f"Recipe {new_recipe.title} created successfully with ingredients"}, 201
+
+
+def update_recipe(session, recipe_id, data, user_id):
+    error = validate_recipe_update(data)
+    if error:
+        return {"error": error}, 400
+    # Children in the payload are loaded up front so the commit is the only flush
+    expand = [relationship for relationship in Recipe.EXPANDABLE if relationship in data]
+    recipe = session.get(Recipe, recipe_id, options=Recipe.expand_options(expand))
+    if recipe is None:
+        return {"error": f'Recipe with ID {recipe_id} not found'}, 404
+    if recipe.user_id != user_id:
+        return {"error": "Stop trying to edit a recipe you didn't post!"}, 403
+    # Update recipe details, ingredients and directions
+    try:
+        recipe.set_children(data.get('ingredients'), data.get('directions'))
+    except ValueError as e:
+        session.rollback()
+        return {"error": str(e)}, 400
+    recipe.set_fields(**data)
+    session.commit()
+    return {"success": "Recipe updated successfully"}, 200
+
+
+def delete_recipe(session, recipe_id, user_id):
+    recipe = session.get(Recipe, recipe_id)
+    if recipe is None:
+        return {"error": "Recipe not found"}, 404
+    if recipe.user_id != user_id:
+        return {"error": "You do not have permission to delete this recipe"}, 403
+    session.delete(recipe)
+    session.commit()
+    return {"success": "Recipe has been deleted successfully"}, 200
+
+
+def get_user(session, user_id):
+    user = session.get(User, user_id)
+    if user is None:
+        return {"error": "User not found"}, 404
+    return user.to_dict(), 200
+
+
+# GET /favorites
+def favorite_states(session, user_id):
+    return session.execute(select(Recipe.recipe_id, Recipe.version).join(Favorite)
+                           .where(Favorite.user_id == user_id, Favorite.is_favorite == True)
+                           .order_by(Recipe.recipe_id)).all()
+
+
+def get_favorites(session, user_id):
+    favorite_recipes = session.scalars(select(Recipe).join(Favorite)
+                                       .where(Favorite.user_id == user_id, Favorite.is_favorite == True))
+    return {"favorites": [recipe.to_dict() for recipe in favorite_recipes]}
+
+
+def toggle_favorite(session, user_id, recipe_id):
+    if session.get(Recipe, recipe_id) is None:
+        return {"error": f"Recipe with ID {recipe_id} not found"}, 404
+    # The flip happens in the database and returns the new state, so concurrent toggles
+    # each move favorite_count by the change they actually made
+    statement = UPSERT_INSERTS[session.get_bind().dialect.name](Favorite).values(
+        user_id=user_id, recipe_id=recipe_id, is_favorite=True)
+    is_favorite = session.scalar(statement.on_conflict_do_update(
+        index_elements=[Favorite.user_id, Favorite.recipe_id],
+        set_={'is_favorite': ~Favorite.is_favorite}).returning(Favorite.is_favorite))
+    session.execute(Recipe.favorite_count_change(recipe_id, 1 if is_favorite else -1))
+    session.commit()
+    favorites_changed(user_id, [recipe_id])
+    return {"success": "Favorite status updated successfully"}, 200
+
+
+def remove_favorite(session, user_id, recipe_id):
+    was_favorite = session.scalar(delete(Favorite).where(Favorite.user_id == user_id, Favorite.recipe_id == recipe_id)
+                                  .returning(Favorite.is_favorite))
+    if was_favorite is None:
+        return {"error": "Recipe is not in your favorites"}, 404
+    if was_favorite:
+        session.execute(Recipe.favorite_count_change(recipe_id, -1))
+    session.commit()
+    favorites_changed(user_id, [recipe_id])
+    return {"success": "Recipe removed from favorites successfully"}, 200
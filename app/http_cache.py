@@ -0,0 +1,75 @@
+import hashlib
+from flask import current_app, request, make_response
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header, parse_etags, parse_date, quote_etag, http_date
+from . import view_name
+from .models import as_utc
+
+
+# The helpers below take plain values so the ASGI app (app/asgi.py) can share them
+def etag(path, states, *extra):
+    # states are (recipe_id, version) rows; the request path and query string are
+    # part of the tag because fields/expand change the representation. Lists get no
+    # Last-Modified: no updated_at moves when a recipe leaves a list, the tag changes.
+    digest = hashlib.sha1(path.encode())
+    for part in extra:
+        digest.update(f'|{part}'.encode())
+    for recipe_id, version in states:
+        digest.update(f'|{recipe_id}:{version}'.encode())
+    return digest.hexdigest()
+
+
+def is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+    """Whether a client sending these If-None-Match / If-Modified-Since header values has the current copy."""
+    if if_none_match:
+        # weak comparison (RFC 9110): compressed responses carry the weak form of the tag
+        return parse_etags(if_none_match).contains_weak(etag)
+    since = parse_date(if_modified_since)
+    if since and last_modified:
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def validators(path, states, *extra, last_modified=None, if_none_match=None, if_modified_since=None):
+    """(headers, not_modified): the ETag (and Last-Modified) headers of a response built from `states`,
+    and whether a client sending these If-None-Match / If-Modified-Since values has it already.
+    If-Modified-Since is only honoured with a `last_modified` (a single recipe's updated_at)."""
+    tag = etag(path, states, *extra)
+    last_modified = as_utc(last_modified)
+    headers = {'ETag': quote_etag(tag)}
+    if last_modified:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers, is_not_modified(tag, last_modified, if_none_match, if_modified_since)
+
+
+def wants_stream(args, accept):
+    """Whether a recipe list is sent as NDJSON: ?stream=1, or an Accept header preferring it."""
+    return args.get('stream') == '1' or parse_accept_header(accept, MIMEAccept).best == 'application/x-ndjson'
+
+
+def cache_control(view, method, status, config):
+    """The CACHE_CONTROL policy for a response of `view`, if it gets one."""
+    if method == 'GET' and status in (200, 304):
+        return config['CACHE_CONTROL'].get(view)
+    return None
+
+
+def conditional_response(states, build, *extra, last_modified=None):
+    """304 without calling build() when the client's copy is current, otherwise build() with validators()."""
+    headers, not_modified = validators(request.full_path, states, *extra, last_modified=last_modified,
+                                       if_none_match=request.headers.get('If-None-Match'),
+                                       if_modified_since=request.headers.get('If-Modified-Since'))
+    response = current_app.response_class(status=304) if not_modified else make_response(build())
+    response.headers.update(headers)
+    return response
+
+
+def apply_cache_control(response):
+    policy = cache_control(view_name(request.endpoint), request.method, response.status_code, current_app.config)
+    if policy and 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = policy
+    return response
+
+
+def init_app(app):
+    app.after_request(apply_cache_control)
@@ -0,0 +1,166 @@
+
+import json
+from itertools import islice
+from flask import current_app
+from sqlalchemy import insert
+from . import db, search
+from .models import Recipe, Ingredient, Direction, total_time
+from .ingredients import ingredient_index
+from .response_cache import response_cache, recipe_tags
+
+
+class InvalidLine(ValueError):
+    pass
+
+
+# field -> (accepted type, may be null); values are checked whenever the field is present.
+# Child ids only mean something to PUT /recipes/<id> (Recipe.set_children); imports ignore them.
+RECIPE_FIELDS = {'title': (str, False), 'cook_time': (int, False), 'prep_time': (int, False), 'tips': (str, True)}
+INGREDIENT_FIELDS = {'ingredient_id': (int, True), 'name': (str, False), 'quantity': ((int, float), True),
+                     'units': (str, True)}
+DIRECTION_FIELDS = {'direction_id': (int, True), 'step_number': (int, False), 'instruction': (str, False)}
+TYPE_NAMES = {str: 'a string', int: 'an integer', (int, float): 'a number'}
+
+
+def parse_ndjson(lines):
+    # Blank lines are skipped; malformed ones become per-item errors instead of aborting the import
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield InvalidLine(f'Invalid JSON: {e}')
+
+
+def validate_recipe(data):
+    if isinstance(data, InvalidLine):
+        return str(data)
+    if not isinstance(data, dict):
+        return 'Each recipe must be a JSON object'
+    required_fields = ['title', 'cook_time', 'prep_time', 'ingredients']
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        return f"Missing fields: {', '.join(missing_fields)}"
+    return validate_fields(data, RECIPE_FIELDS) or validate_children(data)
+
+
+def validate_recipe_update(data):
+    # PUT /recipes/<id>: every field is optional, children are replaced as a whole list
+    if not isinstance(data, dict):
+        return 'Request body must be a JSON object'
+    return validate_fields(data, RECIPE_FIELDS) or validate_children(data)
+
+
+def validate_fields(data, fields, prefix=''):
+    for field, (types, nullable) in fields.items():
+        if field not in data:
+            continue
+        value = data[field]
+        if value is None:
+            if not nullable:
+                return f'{prefix}{field} must not be null'
+        # bool is an int subclass, but true is not a cook time
+        elif isinstance(value, bool) or not isinstance(value, types):
+            return f'{prefix}{field} must be {TYPE_NAMES[types]}'
+        elif isinstance(value, str) and not nullable and not value.strip():
+            return f'{prefix}{field} must not be empty'
+        elif isinstance(value, (int, float)) and value < 0:
+            return f'{prefix}{field} must not be negative'
+    return None
+
+
+def validate_children(data):
+    if not isinstance(data.get('ingredients', []), list) or not isinstance(data.get('directions', []), list):
+        return 'ingredients and directions must be lists'
+    for ingredient_data in data.get('ingredients', []):
+        if not isinstance(ingredient_data, dict) or 'name' not in ingredient_data or 'quantity' not in ingredient_data or 'units' not in ingredient_data:
+            return 'Each ingredient must include a name, quantity, and units'
+        error = validate_fields(ingredient_data, INGREDIENT_FIELDS, 'ingredient ')
+        if error:
+            return error
+    for direction_data in data.get('directions', []):
+        if not isinstance(direction_data, dict) or 'step_number' not in direction_data or 'instruction' not in direction_data:
+            return 'Each direction must include a step_number and instruction'
+        error = validate_fields(direction_data, DIRECTION_FIELDS, 'direction ')
+        if error:
+            return error
+    return None
+
+
+def import_recipes(items, user_id=None, chunk_size=500):
+    report = {'created': 0, 'recipe_ids': [], 'errors': []}
+    items = enumerate(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return report
+        valid = []
+        for index, data in chunk:
+            error = validate_recipe(data)
+            if error:
+                report['errors'].append({'index': index, 'error': error})
+            else:
+                valid.append((index, data))
+        if not valid:
+            continue
+        try:
+            recipe_ids = _write_chunk([data for _, data in valid], user_id)
+        except Exception:
+            db.session.rollback()
+            recipe_ids = _write_one_by_one(valid, user_id, report)
+        report['created'] += len(recipe_ids)
+        report['recipe_ids'].extend(recipe_ids)
+
+
+def _write_one_by_one(valid, user_id, report):
+    # A failed chunk is written again one recipe per transaction, so only the recipes
+    # the database rejects are reported. The cause is logged, not sent to the client.
+    recipe_ids = []
+    for index, data in valid:
+        try:
+            recipe_ids.extend(_write_chunk([data], user_id))
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception('Could not import recipe at index %d', index)
+            report['errors'].append({'index': index, 'error': 'Could not import this recipe'})
+    return recipe_ids
+
+
+def _write_chunk(recipes, user_id):
+    # One executemany per table and one commit for the whole chunk
+    recipe_ids = db.session.scalars(
+        insert(Recipe).returning(Recipe.recipe_id, sort_by_parameter_order=True),
+        [{
+            'title': data['title'],
+            'cook_time': data.get('cook_time'),
+            'prep_time': data.get('prep_time'),
+            'total_time': total_time(data.get('cook_time'), data.get('prep_time')),
+            'tips': data.get('tips', ''),
+            'user_id': user_id,
+        } for data in recipes]
+    ).all()
+    ingredients = [{
+        'recipe_id': recipe_id,
+        'name': ingredient_data['name'],
+        'quantity': ingredient_data['quantity'],
+        'units': ingredient_data['units'],
+    } for recipe_id, data in zip(recipe_ids, recipes) for ingredient_data in data['ingredients']]
+    directions = [{
+        'recipe_id': recipe_id,
+        'step_number': direction_data['step_number'],
+        'instruction': direction_data['instruction'],
+    } for recipe_id, data in zip(recipe_ids, recipes) for direction_data in data.get('directions', [])]
+    if ingredients:
+        db.session.execute(insert(Ingredient), ingredients)
+    if directions:
+        db.session.execute(insert(Direction), directions)
+    # Core inserts skip the after_flush refresh, so rebuild the chunk's search documents here
+    search.refresh_documents(db.session.connection(), recipe_ids)
+    db.session.commit()
+    # Core-style inserts bypass the ORM flush events the index and response cache listen to
+    ingredient_index.mark_dirty(recipe_ids)
+    response_cache.invalidate(*recipe_tags())
+    return recipe_ids
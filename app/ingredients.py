@@ -0,0 +1,175 @@
+
+import re
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from threading import Lock, Thread
+from sqlalchemy import inspect, select
+from flask import current_app
+from werkzeug.local import LocalProxy
+from . import db
+from .changes import on_committed_change
+from .models import Recipe, Ingredient
+
+
+# Words that describe how an ingredient is prepared rather than what it is
+DESCRIPTORS = {'fresh', 'chopped', 'diced', 'minced', 'sliced', 'grated', 'large', 'small', 'medium',
+               'whole', 'dried', 'raw', 'to', 'taste', 'of', 'and', 'or', 'for', 'optional'}
+
+
+def singular(word):
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('oes', 'shes', 'ches')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient(name):
+    words = [singular(word) for word in re.findall(r'[a-z]+', name.lower()) if word not in DESCRIPTORS]
+    return ' '.join(words)
+
+
+class Terms:
+    """Canonical ingredient -> sorted array of recipe ids, plus the reverse mapping."""
+
+    def __init__(self):
+        self.vocabulary = {}   # canonical name -> term id
+        self.names = []        # term id -> canonical name
+        self.postings = []     # term id -> array('I') of recipe ids
+        self.recipes = {}      # recipe id -> frozenset of term ids
+
+    def term_id(self, name):
+        term_id = self.vocabulary.get(name)
+        if term_id is None:
+            term_id = self.vocabulary[name] = len(self.postings)
+            self.names.append(name)
+            self.postings.append(array('I'))
+        return term_id
+
+    def set_recipe(self, recipe_id, names):
+        old_terms = self.recipes.pop(recipe_id, frozenset())
+        new_terms = frozenset(self.term_id(name) for name in names if name)
+        for term_id in old_terms - new_terms:
+            postings = self.postings[term_id]
+            del postings[bisect_left(postings, recipe_id)]
+        for term_id in new_terms - old_terms:
+            insort(self.postings[term_id], recipe_id)
+        if new_terms:
+            self.recipes[recipe_id] = new_terms
+
+
+class IngredientIndex:
+    """Terms of every recipe, kept current from the recipes marked dirty.
+
+    The first query builds the index; after `max_age` seconds a background thread
+    builds a new one from scratch while queries keep using the old, and swaps it in.
+    """
+
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self._lock = Lock()
+        self._build_lock = Lock()
+        self._terms = None
+        self._dirty = set()
+        self._replay = None     # recipes refreshed while a background rebuild runs
+        self._built_at = None
+
+    def mark_dirty(self, recipe_ids):
+        with self._lock:
+            self._dirty.update(recipe_ids)
+
+    def _load(self):
+        terms = Terms()
+        rows = db.session.execute(
+            select(Ingredient.recipe_id, Ingredient.name).order_by(Ingredient.recipe_id).execution_options(yield_per=5000))
+        names = {}
+        for recipe_id, name in rows:
+            names.setdefault(recipe_id, set()).add(normalize_ingredient(name))
+        for recipe_id in sorted(names):
+            terms.set_recipe(recipe_id, names[recipe_id])
+        return terms
+
+    def _rebuild(self, app):
+        terms = None
+        try:
+            with app.app_context():
+                terms = self._load()
+        except Exception:
+            app.logger.exception('Could not rebuild the ingredient index')
+        with self._lock:
+            if terms is not None:
+                self._terms = terms
+            # recipes refreshed into the old index meanwhile may have changed after the new one read them
+            self._dirty.update(self._replay)
+            self._replay = None
+            self._built_at = time.monotonic()
+
+    def _refresh(self, recipe_ids):
+        names = {recipe_id: set() for recipe_id in recipe_ids}
+        rows = db.session.execute(
+            select(Ingredient.recipe_id, Ingredient.name).where(Ingredient.recipe_id.in_(recipe_ids)))
+        for recipe_id, name in rows:
+            names[recipe_id].add(normalize_ingredient(name))
+        for recipe_id, recipe_names in names.items():
+            self._terms.set_recipe(recipe_id, recipe_names)
+
+    def sync(self):
+        if self._terms is None:
+            # the first build has nothing to serve meanwhile: one request builds, the others wait
+            with self._build_lock:
+                if self._terms is None:
+                    terms = self._load()
+                    with self._lock:
+                        self._terms, self._built_at = terms, time.monotonic()
+        with self._lock:
+            if self._replay is None and time.monotonic() - self._built_at > self.max_age:
+                self._replay = set()
+                Thread(target=self._rebuild, args=(current_app._get_current_object(),),
+                       name='ingredient-index', daemon=True).start()
+            if self._dirty:
+                dirty, self._dirty = self._dirty, set()
+                self._refresh(list(dirty))
+                if self._replay is not None:
+                    self._replay.update(dirty)
+
+    def match(self, have, missing_max=0):
+        """[(recipe_id, missing canonical names)] for recipes missing at most `missing_max` ingredients."""
+        self.sync()
+        with self._lock:
+            terms = self._terms
+            have_terms = {terms.vocabulary[name] for name in map(normalize_ingredient, have) if name in terms.vocabulary}
+            matched = Counter()
+            for term_id in have_terms:
+                matched.update(terms.postings[term_id])
+            results = []
+            for recipe_id, count in matched.items():
+                recipe_terms = terms.recipes[recipe_id]
+                if len(recipe_terms) - count > missing_max:
+                    continue
+                missing = sorted(terms.names[term_id] for term_id in recipe_terms - have_terms)
+                results.append((recipe_id, missing))
+        results.sort(key=lambda result: (len(result[1]), result[0]))
+        return results
+
+
+def init_app(app):
+    app.extensions['ingredient_index'] = IngredientIndex(app.config['INGREDIENT_INDEX_MAX_AGE'])
+
+
+# The current app's index
+ingredient_index = LocalProxy(lambda: current_app.extensions['ingredient_index'])
+
+
+# Recipes touched by ORM writes are re-read the next time the index is queried
+def changed_recipes(session, obj):
+    if isinstance(obj, (Recipe, Ingredient)):
+        # an ingredient moved to another recipe changes both
+        return inspect(obj).attrs.recipe_id.history.sum()
+    return None
+
+
+on_committed_change(changed_recipes, lambda changed: ingredient_index.mark_dirty(changed))
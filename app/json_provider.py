@@ -0,0 +1,71 @@
+
+import dataclasses
+import decimal
+import json
+import uuid
+from time import perf_counter
+from datetime import date, datetime, timezone
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def _default(o):
+    # datetimes are stored as naive UTC, send them as ISO-8601 with an explicit offset
+    if isinstance(o, datetime):
+        return (o if o.tzinfo else o.replace(tzinfo=timezone.utc)).isoformat()
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """orjson when it is installed and enabled, the stdlib otherwise; both encode datetimes as ISO-8601."""
+
+    default = staticmethod(_default)
+    sort_keys = False
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.use_orjson = orjson is not None and app.config.get('JSON_USE_ORJSON', True)
+        # Called with the seconds spent encoding each response body (set by app/metrics.py)
+        self.timer = None
+
+    def dumps_bytes(self, obj):
+        if self.timer is None:
+            return self._encode(obj)
+        started = perf_counter()
+        try:
+            return self._encode(obj)
+        finally:
+            self.timer(perf_counter() - started)
+
+    def _encode(self, obj):
+        if self.use_orjson:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(obj, default=_default, ensure_ascii=self.ensure_ascii,
+                          sort_keys=self.sort_keys, separators=(',', ':')).encode()
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and not kwargs:
+            return self.dumps_bytes(obj).decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        # Encode straight to bytes, skipping the str round trip (and pretty printing)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,136 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+from sqlalchemy import tuple_
+from sqlalchemy.sql.expression import UnaryExpression
+from sqlalchemy.sql.operators import custom_op
+from .models import Recipe
+
+
+# ?sort= -> (column, descending); recipe_id breaks ties so keyset pages never skip or repeat rows
+SORTS = {
+    'recipe_id': (Recipe.recipe_id, False),
+    'created_at': (Recipe.created_at, False),
+    '-created_at': (Recipe.created_at, True),
+    'total_time': (Recipe.total_time, False),
+    '-total_time': (Recipe.total_time, True),
+}
+
+# ?<name>_min= and ?<name>_max=, in minutes, both inclusive
+RANGE_FILTERS = {
+    'cook_time': Recipe.cook_time,
+    'prep_time': Recipe.prep_time,
+    'total_time': Recipe.total_time,
+}
+
+
+# +recipe_id sorts and compares like recipe_id, but SQLite can't walk the primary key for it
+RECIPE_ID_EXPRESSION = UnaryExpression(Recipe.recipe_id, operator=custom_op('+'))
+
+
+class RecipeListing:
+    """Filters, sort order and keyset cursor of one GET /recipes request.
+
+    `ranged` is set when a time or created_at range is among the filters. Sorted by
+    recipe_id, SQLite would rather walk the primary key in order and test every row
+    against the range, reading the whole table when few rows match; the listing then
+    orders by +recipe_id, so the range's index finds the rows and only those are sorted.
+    """
+
+    def __init__(self, filters, sort='recipe_id', cursor=None, ranged=False):
+        self.filters = filters
+        self.sort = sort
+        self.column, self.descending = SORTS[sort]
+        self.cursor = cursor
+        self.ranged = ranged
+
+    @property
+    def recipe_id(self):
+        return RECIPE_ID_EXPRESSION if self.ranged else Recipe.recipe_id
+
+    @property
+    def conditions(self):
+        if self.cursor is None:
+            return list(self.filters)
+        if self.sort == 'recipe_id':
+            return self.filters + [self.recipe_id > self.cursor]
+        key, after = tuple_(self.column, Recipe.recipe_id), tuple_(*self.cursor)
+        return self.filters + [key < after if self.descending else key > after]
+
+    @property
+    def order_by(self):
+        if self.sort == 'recipe_id':
+            return [self.recipe_id]
+        if self.descending:
+            return [self.column.desc(), Recipe.recipe_id.desc()]
+        return [self.column, Recipe.recipe_id]
+
+    @property
+    def sort_fields(self):
+        # Columns the next cursor is built from, selected even when ?fields= leaves them out
+        return [] if self.sort == 'recipe_id' else [self.column.key]
+
+    def next_cursor(self, row):
+        # recipe_id pages keep the plain integer cursor; other sorts get an opaque one
+        if self.sort == 'recipe_id':
+            return row.recipe_id
+        value = getattr(row, self.column.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        return base64.urlsafe_b64encode(json.dumps([value, row.recipe_id]).encode()).decode().rstrip('=')
+
+    def parse_cursor(self, cursor):
+        if self.sort == 'recipe_id':
+            return int(cursor)
+        try:
+            value, recipe_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if self.column is Recipe.created_at:
+                value = datetime.fromisoformat(value)
+            return value, int(recipe_id)
+        except (binascii.Error, ValueError, TypeError):
+            raise ValueError(cursor)
+
+
+def parse_datetime(value):
+    # ISO-8601; naive values are taken as UTC, like the stored created_at
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_listing(args, user_id=None):
+    """RecipeListing for ?sort=, ?cursor=, the time ranges, ?user_id= and ?created_after=/created_before=."""
+    sort = args.get('sort', 'recipe_id')
+    if sort not in SORTS:
+        return None, ({"error": f"sort must be one of: {', '.join(SORTS)}"}, 400)
+    filters = []
+    try:
+        for name, column in RANGE_FILTERS.items():
+            if f'{name}_min' in args:
+                filters.append(column >= int(args[f'{name}_min']))
+            if f'{name}_max' in args:
+                filters.append(column <= int(args[f'{name}_max']))
+        if user_id is None and 'user_id' in args:
+            user_id = int(args['user_id'])
+    except ValueError:
+        return None, ({"error": "time filters and user_id must be integers"}, 400)
+    if user_id is not None:
+        filters.append(Recipe.user_id == user_id)
+    try:
+        if 'created_after' in args:
+            filters.append(Recipe.created_at >= parse_datetime(args['created_after']))
+        if 'created_before' in args:
+            filters.append(Recipe.created_at < parse_datetime(args['created_before']))
+    except ValueError:
+        return None, ({"error": "created_after and created_before must be ISO-8601 datetimes"}, 400)
+    ranged = any(f'{name}_{end}' in args for name in RANGE_FILTERS for end in ('min', 'max')) \
+        or 'created_after' in args or 'created_before' in args
+    listing = RecipeListing(filters, sort, ranged=ranged)
+    if 'cursor' in args:
+        try:
+            listing.cursor = listing.parse_cursor(args['cursor'])
+        except ValueError:
+            return None, ({"error": "Invalid cursor"}, 400)
+    return listing, None
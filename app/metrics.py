@@ -0,0 +1,157 @@
+import cProfile
+import os
+import time
+from bisect import bisect_left
+from threading import Lock
+from flask import current_app, g, request, has_request_context
+from sqlalchemy import event
+from . import db, view_name
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SERIALIZATION_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per endpoint, rendered in the Prometheus text format."""
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._lock = Lock()
+        self._series = {}   # endpoint -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, endpoint, value):
+        with self._lock:
+            series = self._series.get(endpoint)
+            if series is None:
+                series = self._series[endpoint] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {endpoint: list(values) for endpoint, values in self._series.items()}
+        for endpoint, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{endpoint="{endpoint}"}} {values[-1]}')
+            lines.append(f'{self.name}_count{{endpoint="{endpoint}"}} {cumulative}')
+        return '\n'.join(lines)
+
+
+class Metrics:
+    """One app's histograms."""
+
+    def __init__(self):
+        self.request_duration = Histogram('cookbook_request_duration_seconds', 'Wall time from routing to the last body byte.', DURATION_BUCKETS)
+        self.sql_queries = Histogram('cookbook_sql_queries', 'SQL statements executed per request.', QUERY_BUCKETS)
+        self.sql_duration = Histogram('cookbook_sql_duration_seconds', 'Time spent in SQL statements per request.', DURATION_BUCKETS)
+        self.serialization_duration = Histogram('cookbook_serialization_duration_seconds', 'Time spent encoding JSON per request.', SERIALIZATION_BUCKETS)
+        self.response_size = Histogram('cookbook_response_size_bytes', 'Response body size, when known up front.', SIZE_BUCKETS)
+
+    def render(self):
+        histograms = (self.request_duration, self.sql_queries, self.sql_duration, self.serialization_duration, self.response_size)
+        return '\n'.join(histogram.render() for histogram in histograms) + '\n'
+
+
+def render():
+    return current_app.extensions['metrics'].render()
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serialization_time = 0.0
+        self.profiler = None
+
+
+def current_timings():
+    return getattr(g, 'request_timings', None) if has_request_context() else None
+
+
+def record_serialization(seconds):
+    timings = current_timings()
+    if timings is not None:
+        timings.serialization_time += seconds
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    timings = current_timings()
+    if timings is not None:
+        timings.sql_count += 1
+        timings.sql_time += elapsed
+
+
+def start_request():
+    g.request_timings = timings = RequestTimings()
+    if current_app.config['METRICS_DEBUG'] and current_app.config['METRICS_PROFILE_DIR']:
+        timings.profiler = cProfile.Profile()
+        timings.profiler.enable()
+
+
+def finish_request(response):
+    timings = current_timings()
+    if timings is None:
+        return response
+    endpoint = view_name(request.endpoint) or 'unmatched'
+    if current_app.config['METRICS_DEBUG']:
+        elapsed = time.perf_counter() - timings.started
+        response.headers['Server-Timing'] = ', '.join([
+            f'app;dur={elapsed * 1000:.2f}',
+            f'sql;desc="{timings.sql_count} queries";dur={timings.sql_time * 1000:.2f}',
+            f'serialize;dur={timings.serialization_time * 1000:.2f}',
+        ])
+    size = response.calculate_content_length()
+    app = current_app._get_current_object()
+    metrics = app.extensions['metrics']
+
+    def observe():
+        elapsed = time.perf_counter() - timings.started
+        if timings.profiler is not None:
+            timings.profiler.disable()
+            if elapsed >= app.config['METRICS_PROFILE_THRESHOLD']:
+                dump_profile(timings.profiler, app.config['METRICS_PROFILE_DIR'], endpoint, elapsed)
+        metrics.request_duration.observe(endpoint, elapsed)
+        metrics.sql_queries.observe(endpoint, timings.sql_count)
+        metrics.sql_duration.observe(endpoint, timings.sql_time)
+        metrics.serialization_duration.observe(endpoint, timings.serialization_time)
+        if size is not None:
+            metrics.response_size.observe(endpoint, size)
+    if response.is_streamed:
+        # the body is still being produced, observe once the server closes the response
+        response.call_on_close(observe)
+    else:
+        observe()
+    return response
+
+
+def dump_profile(profiler, directory, endpoint, elapsed):
+    # Inspect with: python -m pstats profiles/get_recipes-1760800000123-812ms.pstats
+    os.makedirs(directory, exist_ok=True)
+    filename = f'{endpoint}-{time.time_ns() // 1_000_000}-{elapsed * 1000:.0f}ms.pstats'
+    profiler.dump_stats(os.path.join(directory, filename))
+
+
+# Only imported and installed when METRICS_ENABLED
+def init_app(app):
+    app.extensions['metrics'] = Metrics()
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.json.timer = record_serialization
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
@@ -2,28 +2,42 @@
 import secrets
 from datetime import datetime, timedelta, timezone
 from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.cache import token_cache, Principal
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session, selectinload
+from app.passwords import hash_password, verify_password, needs_rehash
+
+def as_utc(value):
+    # SQLite hands DateTime columns back without tzinfo; they are always stored as UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
 
 class User(db.Model):
     user_id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.Text(50), unique=True, nullable=False)
     email = db.Column(db.Text(50), unique=True)
     password = db.Column(db.Text, nullable=False)
-    token = db.Column(db.Text)
+    token = db.Column(db.Text, index=True)
     token_expiration = db.Column(db.DateTime)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.set_password(kwargs.get('password', ''))
+        if kwargs.get('password'):
+            self.set_password(kwargs['password'])
 
     def __repr__(self):
         return f'<User {self.username}>'
 
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        self.password = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password, password)
+        return verify_password(self.password, password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password)
 
     def save(self):
         db.session.add(self)
@@ -49,28 +63,57 @@ class User(db.Model):
 
     def get_token(self):
         now = datetime.now(timezone.utc)
-        if self.token and self.token_expiration > now + timedelta(minutes=1):
-            return {"token": self.token, "tokenExpiration": self.token_expiration}
-        self.token = secrets.token_hex(16)
-        self.token_expiration = now + timedelta(hours=1)
-        self.save()
+        if not (self.token and as_utc(self.token_expiration) > now + timedelta(minutes=1)):
+            self.forget_token()
+            self.token = secrets.token_hex(16)
+            self.token_expiration = now + timedelta(hours=1)
+            self.save()
+        # Known to this worker from the start, which also lets the rate limiter key by token
+        token_cache.set(self.token, Principal(self.user_id, as_utc(self.token_expiration)))
         return {"token": self.token, "tokenExpiration": self.token_expiration}
 
+    def forget_token(self):
+        # Drop this worker's cached verification so the next request re-reads the user
+        if self.token:
+            token_cache.delete(self.token)
+
     @staticmethod
     def check_token(token):
         return User.query.filter_by(token=token).first() is not None
 
 
 class Recipe(db.Model):
+    # Columns exposed by to_dict() and selectable through GET /recipes?fields=
+    FIELDS = ('recipe_id', 'title', 'cook_time', 'prep_time', 'total_time', 'tips', 'created_at', 'user_id')
+    # Child collections that can be embedded through ?expand=
+    EXPANDABLE = ('ingredients', 'directions')
+
+    __table_args__ = (
+        # GET /recipes?user_id= (and /users/<id>/recipes) sorted by created_at or total_time;
+        # SQLite appends recipe_id (the rowid) to every index, which keeps keyset pages ordered
+        db.Index('ix_recipe_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_recipe_user_id_total_time', 'user_id', 'total_time'),
+    )
+
     recipe_id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.Text, nullable=False)
-    cook_time = db.Column(db.Integer)  # in minutes
-    prep_time = db.Column(db.Integer)  # in minutes
-    ingredients = db.relationship('Ingredient', backref='recipe', lazy=True)
-    directions = db.relationship('Direction', backref='recipe', lazy=True)
+    cook_time = db.Column(db.Integer, index=True)  # in minutes
+    prep_time = db.Column(db.Integer, index=True)  # in minutes
+    # cook_time + prep_time, kept by touch_changed_recipes (and the bulk importer) for filtering and sorting
+    total_time = db.Column(db.Integer, nullable=False, default=0, index=True)
+    ingredients = db.relationship('Ingredient', backref='recipe', lazy=True, cascade='all, delete-orphan')
+    directions = db.relationship('Direction', backref='recipe', lazy=True, order_by='Direction.step_number',
+                                 cascade='all, delete-orphan')
+    favorites = db.relationship('Favorite', backref='recipe', lazy=True, cascade='all, delete-orphan')
     tips = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
-    user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'), nullable=True)  # Updated line
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    # Bumped on every change to the recipe or its ingredients/directions, feeds ETag/Last-Modified
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    version = db.Column(db.Integer, nullable=False, default=1)
+    # Number of users with is_favorite set; kept by favorite_count_change, repaired by
+    # `flask reconcile-favorite-counts`. Only served by GET /recipes/popular.
+    favorite_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'), nullable=True, index=True)  # Updated line
 
     def __init__(self, title, cook_time=None, prep_time=None, tips=None, user_id=None):
         self.title = title
@@ -82,46 +125,125 @@ class Recipe(db.Model):
     def __repr__(self):
         return f'<Recipe {self.title}>'
 
+    @classmethod
+    def columns(cls, fields=None):
+        # recipe_id is always selected, it is the pagination cursor
+        fields = fields or cls.FIELDS
+        return [cls.recipe_id] + [getattr(cls, f) for f in fields if f != 'recipe_id']
+
+    # Nothing below commits but update(); the caller commits once for the whole change
     def add_ingredient(self, name, quantity, units):
         ingredient = Ingredient(name=name, quantity=quantity, units=units)
         self.ingredients.append(ingredient)
-        db.session.add(ingredient)
-        db.session.commit()
+        return ingredient
 
     def add_direction(self, step_number, instruction):
-        direction = Direction(step_number=step_number, instruction=instruction, recipe_id=self.recipe_id)
-        db.session.add(direction)
-        db.session.commit()
+        direction = Direction(step_number=step_number, instruction=instruction, recipe_id=None)
+        self.directions.append(direction)
+        return direction
 
-    def update(self, **kwargs):
+    def set_fields(self, **kwargs):
         allowed_fields = ['title', 'cook_time', 'prep_time', 'tips']
         for key, value in kwargs.items():
             if key in allowed_fields:
                 setattr(self, key, value)
+
+    def set_children(self, ingredients=None, directions=None):
+        """Make the ingredients/directions match the given lists; None leaves a collection alone.
+
+        Only the difference is written: rows whose values changed are updated, missing
+        ones deleted and new ones inserted. Raises ValueError, before changing anything,
+        for an id that is not one of this recipe's children. Load the collections with
+        expand_options() first so the commit is the only flush.
+        """
+        plans = []
+        if ingredients is not None:
+            plans.append((self.ingredients, ingredients, Ingredient, match_children(self.ingredients, ingredients, Ingredient)))
+        if directions is not None:
+            plans.append((self.directions, directions, Direction, match_children(self.directions, directions, Direction)))
+        for collection, items, model, matched in plans:
+            kept = set(matched.values())
+            for child in [child for child in collection if child not in kept]:
+                collection.remove(child)   # delete-orphan deletes the row
+            for index, item in enumerate(items):
+                child = matched.get(index)
+                if child is None:
+                    collection.append(model(**{field: item[field] for field in model.FIELDS}, recipe_id=None))
+                    continue
+                for field in model.FIELDS:
+                    if getattr(child, field) != item[field]:
+                        setattr(child, field, item[field])
+
+    def update(self, **kwargs):
+        self.set_children(kwargs.get('ingredients'), kwargs.get('directions'))
+        self.set_fields(**kwargs)
         db.session.commit()
 
     def delete(self):
         db.session.delete(self)
         db.session.commit()
 
-    def to_dict(self):
-        return {
+    def to_dict(self, expand=()):
+        data = {
             'recipe_id': self.recipe_id,
             'title': self.title,
             'cook_time': self.cook_time,
             'prep_time': self.prep_time,
+            'total_time': self.total_time,
             'tips': self.tips,
             'created_at': self.created_at,
             'user_id': self.user_id,
         }
+        for relationship in expand:
+            data[relationship] = [child.to_dict() for child in getattr(self, relationship)]
+        return data
+
+    @staticmethod
+    def favorite_count_change(recipe_id, delta):
+        # One UPDATE ... SET favorite_count = favorite_count + ? so concurrent clicks can't lose counts
+        return update(Recipe).where(Recipe.recipe_id == recipe_id).values(favorite_count=Recipe.favorite_count + delta)
+
+    @classmethod
+    def expand_options(cls, expand):
+        # One extra SELECT ... WHERE recipe_id IN (...) per relationship, however many recipes are loaded
+        return [selectinload(getattr(cls, relationship)) for relationship in expand]
+
+
+def match_children(collection, items, model):
+    """{index in items: existing child}, matched by id first, then by the model's MATCH_BY field."""
+    by_id = {getattr(child, model.ID): child for child in collection}
+    unknown = [str(item[model.ID]) for item in items if item.get(model.ID) is not None and item[model.ID] not in by_id]
+    if unknown:
+        raise ValueError(f"Unknown {model.ID}: {', '.join(unknown)}")
+    matched = {}
+    for index, item in enumerate(items):
+        child = by_id.get(item.get(model.ID))
+        if child is not None:
+            if child in matched.values():
+                raise ValueError(f"Duplicate {model.ID}: {item[model.ID]}")
+            matched[index] = child
+    claimed = set(matched.values())
+    unclaimed = {}
+    for child in collection:
+        if child not in claimed:
+            unclaimed.setdefault(getattr(child, model.MATCH_BY), []).append(child)
+    for index, item in enumerate(items):
+        if index not in matched and unclaimed.get(item[model.MATCH_BY]):
+            matched[index] = unclaimed[item[model.MATCH_BY]].pop(0)
+    return matched
 
 
 class Ingredient(db.Model):
+    # Recipe.set_children matches submitted rows by ID, then by MATCH_BY, and copies FIELDS
+    ID = 'ingredient_id'
+    MATCH_BY = 'name'
+    FIELDS = ('name', 'quantity', 'units')
+
     ingredient_id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     quantity = db.Column(db.Float)
     units = db.Column(db.Text(20))
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.recipe_id'), nullable=False)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.recipe_id'), nullable=False, index=True)
 
     def __init__(self, name, quantity=None, units=None, recipe_id=None):
         self.name = name
@@ -132,12 +254,24 @@ class Ingredient(db.Model):
     def __repr__(self):
         return f'<Ingredient {self.name}>'
 
+    def to_dict(self):
+        return {
+            'ingredient_id': self.ingredient_id,
+            'name': self.name,
+            'quantity': self.quantity,
+            'units': self.units,
+        }
+
 
 class Direction(db.Model):
+    ID = 'direction_id'
+    MATCH_BY = 'step_number'
+    FIELDS = ('step_number', 'instruction')
+
     direction_id = db.Column(db.Integer, primary_key=True)
     step_number = db.Column(db.Integer, nullable=False)
     instruction = db.Column(db.Text, nullable=False)
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.recipe_id'), nullable=False)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.recipe_id'), nullable=False, index=True)
 
     def __init__(self, step_number, instruction, recipe_id):
         self.step_number = step_number
@@ -147,12 +281,26 @@ class Direction(db.Model):
     def __repr__(self):
         return f'<Direction {self.step_number}>'
 
+    def to_dict(self):
+        return {
+            'direction_id': self.direction_id,
+            'step_number': self.step_number,
+            'instruction': self.instruction,
+        }
+
 
 class Favorite(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'), primary_key=True)
     recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.recipe_id'), primary_key=True)
     is_favorite = db.Column(db.Boolean, default=True, nullable=False)
 
+    __table_args__ = (
+        # GET /favorites: WHERE user_id = ? AND is_favorite
+        db.Index('ix_favorite_user_id_is_favorite', 'user_id', 'is_favorite'),
+        # deleting a recipe removes its favorites
+        db.Index('ix_favorite_recipe_id', 'recipe_id'),
+    )
+
     def __init__(self, user_id, recipe_id, is_favorite=True):
         self.user_id = user_id
         self.recipe_id = recipe_id
@@ -162,3 +310,48 @@ class Favorite(db.Model):
         return f'<Favorite user_id={self.user_id} recipe_id={self.recipe_id} is_favorite={self.is_favorite}>'
 
 
+# Written only by `flask build-recommendations` (app/recommendations.py). Rows of deleted
+# recipes and users go with them (ON DELETE CASCADE, or the next build on SQLite)
+class SimilarRecipe(db.Model):
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.recipe_id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)   # 0 = most similar
+    similar_recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.recipe_id', ondelete='CASCADE'),
+                                  nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+    # when this recipe's neighbours were computed; --changed-only redoes recipes edited after it
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<SimilarRecipe recipe_id={self.recipe_id} rank={self.rank} similar_recipe_id={self.similar_recipe_id}>'
+
+
+class UserRecommendation(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.user_id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.recipe_id', ondelete='CASCADE'), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<UserRecommendation user_id={self.user_id} rank={self.rank} recipe_id={self.recipe_id}>'
+
+
+@event.listens_for(Session, 'before_flush')
+def touch_changed_recipes(session, flush_context, instances):
+    touched = set()
+    for obj in list(session.dirty) + list(session.new) + list(session.deleted):
+        if isinstance(obj, Recipe) and obj in session.dirty and session.is_modified(obj):
+            touched.add(obj)
+        elif isinstance(obj, (Ingredient, Direction)):
+            recipe = obj.recipe or (obj.recipe_id and session.get(Recipe, obj.recipe_id))
+            if recipe is not None and recipe not in session.new and recipe not in session.deleted:
+                touched.add(recipe)
+    now = datetime.now(timezone.utc)
+    for recipe in touched:
+        recipe.version = (recipe.version or 0) + 1
+        recipe.updated_at = now
+    for recipe in touched.union(obj for obj in session.new if isinstance(obj, Recipe)):
+        recipe.total_time = total_time(recipe.cook_time, recipe.prep_time)
+
+
+def total_time(cook_time, prep_time):
+    return (cook_time or 0) + (prep_time or 0)
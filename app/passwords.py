@@ -0,0 +1,52 @@
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from threading import BoundedSemaphore
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHashBusy(Exception):
+    pass
+
+
+# scrypt and pbkdf2 release the GIL, so a small thread pool per app caps how many
+# cores a login burst can take without blocking the rest of the worker.
+def init_app(app):
+    # The pool starts its threads on first use, so a gunicorn master that preloads the app forks before any exist
+    app.extensions['password_hash'] = (
+        ThreadPoolExecutor(max_workers=app.config['PASSWORD_HASH_WORKERS'], thread_name_prefix='password-hash'),
+        BoundedSemaphore(app.config['PASSWORD_HASH_WORKERS'] + app.config['PASSWORD_HASH_QUEUE']))
+
+
+def _run(func, *args, **kwargs):
+    executor, slots = current_app.extensions['password_hash']
+    # Shed load instead of queueing logins until the client times out
+    if not slots.acquire(timeout=current_app.config['PASSWORD_HASH_TIMEOUT']):
+        raise PasswordHashBusy()
+    try:
+        return executor.submit(func, *args, **kwargs).result()
+    finally:
+        slots.release()
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password,
+                method=current_app.config['PASSWORD_HASH_METHOD'],
+                salt_length=current_app.config['PASSWORD_SALT_LENGTH'])
+
+
+def verify_password(pwhash, password):
+    return _run(check_password_hash, pwhash, password)
+
+
+@lru_cache(maxsize=None)
+def stored_method(method):
+    # werkzeug writes shorthand methods out in full ('scrypt' -> 'scrypt:32768:8:1'), ask it how
+    return generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+
+
+def needs_rehash(pwhash):
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    current = pwhash.split('$', 1)[0]
+    return current != method and current != stored_method(method)
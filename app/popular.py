@@ -0,0 +1,106 @@
+import heapq
+import time
+from threading import Lock
+from sqlalchemy import inspect, select, update, func, true
+from flask import current_app
+from werkzeug.local import LocalProxy
+from . import db
+from .changes import on_committed_change
+from .models import Recipe, Favorite
+
+
+class PopularRecipes:
+    """Top recipes by favorite_count, kept as a candidate pool of (count, recipe id) pairs.
+
+    The pool holds twice `size` recipes so that unfavoriting a few of them rarely lets an
+    untracked recipe overtake; the periodic rebuild catches the cases that do.
+    """
+
+    def __init__(self, size, max_age):
+        self.size = size
+        self.max_age = max_age
+        self._lock = Lock()
+        self._counts = {}       # recipe id -> favorite_count
+        self._top = []          # [(favorite_count, recipe id)], best first
+        self._dirty = set()
+        self._built_at = None
+
+    def mark_dirty(self, recipe_ids):
+        with self._lock:
+            self._dirty.update(recipe_ids)
+
+    def _rebuild(self):
+        rows = db.session.execute(
+            select(Recipe.recipe_id, Recipe.favorite_count).where(Recipe.favorite_count > 0)
+            .order_by(Recipe.favorite_count.desc()).limit(self.size * 2))
+        self._counts = dict(rows.all())
+        self._dirty.clear()
+        self._built_at = time.monotonic()
+
+    def _refresh(self, recipe_ids):
+        counts = dict.fromkeys(recipe_ids, 0)   # deleted recipes drop out
+        counts.update(db.session.execute(
+            select(Recipe.recipe_id, Recipe.favorite_count).where(Recipe.recipe_id.in_(recipe_ids))).all())
+        floor = min(self._counts.values()) if len(self._counts) >= self.size * 2 else 0
+        for recipe_id, count in counts.items():
+            if count > floor:
+                self._counts[recipe_id] = count
+            else:
+                self._counts.pop(recipe_id, None)
+        if len(self._counts) > self.size * 2:
+            keep = heapq.nlargest(self.size * 2, self._counts.items(), key=lambda item: item[1])
+            self._counts = dict(keep)
+
+    def sync(self):
+        with self._lock:
+            if self._built_at is None or time.monotonic() - self._built_at > self.max_age:
+                self._rebuild()
+            elif self._dirty:
+                dirty, self._dirty = self._dirty, set()
+                self._refresh(list(dirty))
+            else:
+                return
+            self._top = heapq.nlargest(self.size, ((count, -recipe_id) for recipe_id, count in self._counts.items()))
+
+    def top(self, limit):
+        """[(recipe_id, favorite_count)] for the `limit` most favorited recipes, ties by lowest id."""
+        self.sync()
+        with self._lock:
+            return [(-negative_id, count) for count, negative_id in self._top[:limit]]
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+
+def init_app(app):
+    app.extensions['popular_recipes'] = PopularRecipes(app.config['POPULAR_RECIPES_SIZE'], app.config['POPULAR_RECIPES_MAX_AGE'])
+
+
+# The current app's top list
+popular_recipes = LocalProxy(lambda: current_app.extensions['popular_recipes'])
+
+
+def reconcile_favorite_counts():
+    """Recount recipe.favorite_count from the favorite table; returns how many recipes were off."""
+    actual = (select(func.count()).select_from(Favorite)
+              .where(Favorite.recipe_id == Recipe.recipe_id, Favorite.is_favorite == true())
+              .scalar_subquery())
+    result = db.session.execute(
+        update(Recipe).where(Recipe.favorite_count != actual).values(favorite_count=actual),
+        execution_options={'synchronize_session': False})
+    db.session.commit()
+    popular_recipes.invalidate()
+    return result.rowcount
+
+
+# Counts change in the same transaction as the favorite rows, so re-read them after commit
+def changed_favorites(session, obj):
+    if isinstance(obj, Favorite):
+        return inspect(obj).attrs.recipe_id.history.sum()
+    if isinstance(obj, Recipe) and obj in session.deleted:
+        return [obj.recipe_id]
+    return None
+
+
+on_committed_change(changed_favorites, lambda changed: popular_recipes.mark_dirty(changed))
@@ -0,0 +1,121 @@
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from threading import Lock
+from flask import current_app, g, request
+from werkzeug.local import LocalProxy
+from werkzeug.utils import import_string
+from . import view_name
+from .cache import token_cache
+
+
+class BucketStore:
+    """Token bucket state. `take` must be atomic per key; a store shared by every
+    worker (e.g. a Redis script) makes RATE_LIMITS hold across processes and hosts."""
+
+    def take(self, key, capacity, rate):
+        """Spend one token from `key`'s bucket; 0 when allowed, else seconds until one refills."""
+        raise NotImplementedError
+
+
+class MemoryBucketStore(BucketStore):
+    """Per-worker buckets, least recently used ones dropped (i.e. refilled) past `maxsize`."""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()   # key -> (tokens, monotonic time of last update)
+        self._lock = Lock()
+
+    def take(self, key, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class RateLimiter:
+    """Token buckets per (endpoint, client) plus a cap on each endpoint's requests in progress.
+
+    Requests over either limit are refused at once with Retry-After instead of
+    waiting in a queue until they time out.
+    """
+
+    def __init__(self, store, rate_limits, concurrency_limits, enabled=True):
+        self.store = store
+        self.rate_limits = rate_limits                  # endpoint -> (capacity, tokens per second)
+        self.concurrency_limits = concurrency_limits    # endpoint -> requests in progress, per worker
+        self.enabled = enabled
+        self._in_progress = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def client_key(authorization, remote_addr):
+        # A bearer token that already passed token_auth identifies the client. Anything else,
+        # Basic logins and made-up tokens included, goes by address so rotating tokens doesn't help
+        scheme, _, token = (authorization or '').partition(' ')
+        if scheme.lower() == 'bearer' and token and token_cache.get(token) is not None:
+            return 'token:' + hashlib.sha1(token.encode()).hexdigest()[:16]
+        return f'ip:{remote_addr}'
+
+    def admit(self, endpoint, authorization, remote_addr):
+        """None when the request may run (call release() afterwards), else (error, status, retry_after)."""
+        if not self.enabled:
+            return None
+        limit = self.rate_limits.get(endpoint)
+        if limit:
+            wait = self.store.take(f'{endpoint}|{self.client_key(authorization, remote_addr)}', *limit)
+            if wait:
+                return {'error': 'Too many requests. Please slow down'}, 429, math.ceil(wait)
+        cap = self.concurrency_limits.get(endpoint)
+        if cap:
+            with self._lock:
+                if self._in_progress.get(endpoint, 0) >= cap:
+                    return {'error': 'Server busy. Please try again shortly'}, 503, 1
+                self._in_progress[endpoint] = self._in_progress.get(endpoint, 0) + 1
+        return None
+
+    def release(self, endpoint):
+        if self.enabled and endpoint in self.concurrency_limits:
+            with self._lock:
+                self._in_progress[endpoint] -= 1
+
+
+# The current app's limiter
+rate_limiter = LocalProxy(lambda: current_app.extensions['rate_limiter'])
+
+
+def admit_request():
+    endpoint = view_name(request.endpoint)
+    if endpoint is None:
+        return None
+    refused = rate_limiter.admit(endpoint, request.headers.get('Authorization'), request.remote_addr)
+    if refused:
+        error, status, retry_after = refused
+        return error, status, {'Retry-After': str(retry_after)}
+    g.admitted_endpoint = endpoint
+    return None
+
+
+# Runs once the response is complete, for streamed bodies too (stream_with_context keeps the request open)
+def release_request(exc):
+    endpoint = g.pop('admitted_endpoint', None)
+    if endpoint is not None:
+        rate_limiter.release(endpoint)
+
+
+def init_app(app):
+    app.extensions['rate_limiter'] = RateLimiter(
+        import_string(app.config['RATE_LIMIT_BACKEND'])(**app.config['RATE_LIMIT_OPTIONS']),
+        app.config['RATE_LIMITS'], app.config['CONCURRENCY_LIMITS'], enabled=app.config['RATE_LIMIT_ENABLED'])
+    app.before_request(admit_request)
+    app.teardown_request(release_request)
@@ -0,0 +1,246 @@
+import heapq
+import math
+import os
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import cache
+from operator import itemgetter
+from flask import current_app
+from sqlalchemy import select, delete, insert, or_, and_, func, true
+from . import db
+from .ingredients import normalize_ingredient
+from .models import Recipe, Ingredient, Favorite, SimilarRecipe, UserRecommendation
+
+
+@cache
+def load_numpy():
+    # optional speedup, imported on first use: web workers that never need it don't load it
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+# Scores for one batch of recipes are a batch x recipes dense block; keep it around 32 MB
+BATCH_CELLS = 4 * 1024 * 1024
+
+
+class SparseMatrix:
+    """0/1 matrix kept both ways: rows[i] and columns[j] are sorted arrays of the set positions."""
+
+    def __init__(self, row_count):
+        self.rows = [array('I') for _ in range(row_count)]
+        self.columns = []
+
+    def set_row(self, row, columns):
+        # rows must be set in increasing order so every column array stays sorted
+        self.rows[row] = array('I', sorted(columns))
+        for column in self.rows[row]:
+            while column >= len(self.columns):
+                self.columns.append(array('I'))
+            self.columns[column].append(row)
+
+
+def load_matrices():
+    """(recipe ids, recipe-by-ingredient matrix, recipe-by-user favorites matrix).
+
+    Matrix rows are positions in the sorted recipe ids; ingredients are keyed by their
+    canonical name, so "Garlic cloves" and "garlic clove" are the same column.
+    """
+    recipe_ids = array('I', db.session.scalars(select(Recipe.recipe_id).order_by(Recipe.recipe_id)))
+    positions = {recipe_id: row for row, recipe_id in enumerate(recipe_ids)}
+    ingredients, favorites = SparseMatrix(len(recipe_ids)), SparseMatrix(len(recipe_ids))
+    for matrix, query in (
+            (ingredients, select(Ingredient.recipe_id, Ingredient.name).order_by(Ingredient.recipe_id)),
+            (favorites, select(Favorite.recipe_id, Favorite.user_id).where(Favorite.is_favorite == true())
+             .order_by(Favorite.recipe_id))):
+        vocabulary = {}
+        current, columns = None, set()
+        for recipe_id, key in db.session.execute(query.execution_options(yield_per=5000)):
+            if recipe_id != current:
+                if current in positions and columns:
+                    matrix.set_row(positions[current], columns)
+                current, columns = recipe_id, set()
+            if matrix is ingredients:
+                key = normalize_ingredient(key)
+            if key:
+                columns.add(vocabulary.setdefault(key, len(vocabulary)))
+        if current in positions and columns:
+            matrix.set_row(positions[current], columns)
+    return recipe_ids, ingredients, favorites
+
+
+# Set in each pool process by _start_worker: (recipe ids, [(rows, columns, weight, norms)], size)
+_worker = None
+
+
+def _start_worker(recipe_ids, ingredients, favorites, favorite_weight, size):
+    global _worker
+    numpy = load_numpy()
+    parts = []
+    for matrix, weight in ((ingredients, 1 - favorite_weight), (favorites, favorite_weight)):
+        if weight <= 0:
+            continue
+        # empty rows share nothing with anyone, a norm of 1 keeps their zeros from dividing by 0
+        norms = [math.sqrt(len(row)) or 1.0 for row in matrix.rows]
+        columns = matrix.columns
+        if numpy is not None:
+            columns = [numpy.frombuffer(column, dtype=numpy.uint32).astype(numpy.intp) for column in columns]
+            norms = numpy.array(norms)
+        parts.append((matrix.rows, columns, weight, norms))
+    _worker = (recipe_ids, parts, size)
+
+
+def _neighbours(rows):
+    """[(recipe_id, [(similar recipe_id, score)])] for a batch of matrix rows, best first.
+
+    A recipe's score against every other is the weighted cosine similarity of their
+    ingredient rows plus that of their favorite rows: shared columns counted through
+    the column lists (a sparse row-by-matrix product), divided by both row norms.
+    """
+    recipe_ids, parts, size = _worker
+    if load_numpy() is not None:
+        return _neighbours_numpy(rows)
+    results = []
+    for row in rows:
+        scores = {}
+        for matrix_rows, columns, weight, norms in parts:
+            shared = Counter()
+            for column in matrix_rows[row]:
+                shared.update(columns[column])
+            scale = weight / norms[row]
+            for other, count in shared.items():
+                scores[other] = scores.get(other, 0.0) + scale * count / norms[other]
+        scores.pop(row, None)
+        best = heapq.nlargest(size, scores.items(), key=itemgetter(1))
+        results.append((recipe_ids[row], [(recipe_ids[other], score) for other, score in best]))
+    return results
+
+
+def _neighbours_numpy(rows):
+    numpy = load_numpy()
+    recipe_ids, parts, size = _worker
+    count = len(recipe_ids)
+    scores = numpy.zeros((len(rows), count))
+    for matrix_rows, columns, weight, norms in parts:
+        # every row of the batch counts its shared columns with one bincount, offset by row
+        positions = [columns[column] + index * count for index, row in enumerate(rows) for column in matrix_rows[row]]
+        if not positions:
+            continue
+        shared = numpy.bincount(numpy.concatenate(positions), minlength=len(rows) * count).reshape(len(rows), count)
+        scores += (weight * shared) / (norms[rows][:, None] * norms[None, :])
+    batch = numpy.arange(len(rows))
+    scores[batch, rows] = 0
+    if count > size:
+        best = numpy.argpartition(-scores, size, axis=1)[:, :size]
+    else:
+        best = numpy.tile(numpy.arange(count), (len(rows), 1))
+    results = []
+    for index, row in enumerate(rows):
+        candidates = sorted(((scores[index, other], other) for other in best[index].tolist()), key=lambda c: -c[0])
+        results.append((recipe_ids[row], [(recipe_ids[other], float(score)) for score, other in candidates if score > 0]))
+    return results
+
+
+def changed_rows(recipe_ids):
+    """Rows of recipes with no neighbours yet or edited since theirs were computed."""
+    positions = {recipe_id: row for row, recipe_id in enumerate(recipe_ids)}
+    changed = db.session.scalars(
+        select(Recipe.recipe_id)
+        .outerjoin(SimilarRecipe, and_(SimilarRecipe.recipe_id == Recipe.recipe_id, SimilarRecipe.rank == 0))
+        .where(or_(SimilarRecipe.recipe_id.is_(None), Recipe.updated_at > SimilarRecipe.computed_at)))
+    return sorted(positions[recipe_id] for recipe_id in changed if recipe_id in positions)
+
+
+def store_similar(results, computed_at):
+    # one commit per batch: readers see each recipe's old or new neighbours, never none
+    db.session.execute(delete(SimilarRecipe).where(SimilarRecipe.recipe_id.in_([recipe_id for recipe_id, _ in results])))
+    rows = [{'recipe_id': recipe_id, 'rank': rank, 'similar_recipe_id': similar_id, 'score': score, 'computed_at': computed_at}
+            for recipe_id, neighbours in results for rank, (similar_id, score) in enumerate(neighbours)]
+    if rows:
+        db.session.execute(insert(SimilarRecipe), rows)
+    db.session.commit()
+
+
+def build_similar(changed_only=False, workers=None, batch_size=256):
+    """Recompute and store the neighbours of every recipe (or only the changed ones); returns how many."""
+    size = current_app.config['RECOMMENDATIONS_SIZE']
+    recipe_ids, ingredients, favorites = load_matrices()
+    rows = changed_rows(recipe_ids) if changed_only else list(range(len(recipe_ids)))
+    batch_size = max(1, min(batch_size, BATCH_CELLS // max(len(recipe_ids), 1)))
+    batches = [rows[start:start + batch_size] for start in range(0, len(rows), batch_size)]
+    computed_at = datetime.now(timezone.utc)
+    state = (recipe_ids, ingredients, favorites, current_app.config['RECOMMENDATIONS_FAVORITE_WEIGHT'], size)
+    workers = min(workers or os.cpu_count() or 1, len(batches))
+    if workers > 1:
+        with ProcessPoolExecutor(workers, initializer=_start_worker, initargs=state) as pool:
+            for results in pool.map(_neighbours, batches):
+                store_similar(results, computed_at)
+    else:
+        _start_worker(*state)
+        for batch in batches:
+            store_similar(_neighbours(batch), computed_at)
+    if not changed_only:
+        db.session.execute(delete(SimilarRecipe).where(SimilarRecipe.recipe_id.not_in(select(Recipe.recipe_id))))
+        db.session.commit()
+    return len(rows)
+
+
+def build_user_recommendations(batch_size=500):
+    """Recompute every user's recommendations from their favorites' stored neighbours; returns how many users.
+
+    A recipe scores the sum of its similarity to each of the user's favorites, and the
+    user's favorites themselves are left out.
+    """
+    size = current_app.config['RECOMMENDATIONS_SIZE']
+    user_ids = db.session.scalars(
+        select(Favorite.user_id).where(Favorite.is_favorite == true()).distinct().order_by(Favorite.user_id)).all()
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        rows = []
+        for user_id in batch:
+            liked = select(Favorite.recipe_id).where(Favorite.user_id == user_id, Favorite.is_favorite == true())
+            score = func.sum(SimilarRecipe.score)
+            ranked = db.session.execute(
+                select(SimilarRecipe.similar_recipe_id, score)
+                .where(SimilarRecipe.recipe_id.in_(liked), SimilarRecipe.similar_recipe_id.not_in(liked))
+                .group_by(SimilarRecipe.similar_recipe_id)
+                .order_by(score.desc(), SimilarRecipe.similar_recipe_id).limit(size))
+            rows.extend({'user_id': user_id, 'rank': rank, 'recipe_id': recipe_id, 'score': total}
+                        for rank, (recipe_id, total) in enumerate(ranked))
+        db.session.execute(delete(UserRecommendation).where(UserRecommendation.user_id.in_(batch)))
+        if rows:
+            db.session.execute(insert(UserRecommendation), rows)
+        db.session.commit()
+    # users who unfavorited everything
+    db.session.execute(delete(UserRecommendation).where(UserRecommendation.user_id.not_in(
+        select(Favorite.user_id).where(Favorite.is_favorite == true()))))
+    db.session.commit()
+    return len(user_ids)
+
+
+def build_recommendations(changed_only=False, workers=None):
+    """Similar recipes (all, or only the changed ones) then every user's recommendations."""
+    recipes = build_similar(changed_only=changed_only, workers=workers)
+    users = build_user_recommendations()
+    return {'recipes': recipes, 'users': users}
+
+
+def similar_recipes(recipe_id, limit):
+    """Recipe rows with their score, best first: one range read of similar_recipe's primary key."""
+    return db.session.execute(
+        select(*Recipe.columns(), SimilarRecipe.score)
+        .join(Recipe, Recipe.recipe_id == SimilarRecipe.similar_recipe_id)
+        .where(SimilarRecipe.recipe_id == recipe_id)
+        .order_by(SimilarRecipe.rank).limit(limit)).all()
+
+
+def recommended_recipes(user_id, limit):
+    return db.session.execute(
+        select(*Recipe.columns(), UserRecommendation.score)
+        .join(Recipe, Recipe.recipe_id == UserRecommendation.recipe_id)
+        .where(UserRecommendation.user_id == user_id)
+        .order_by(UserRecommendation.rank).limit(limit)).all()
@@ -0,0 +1,154 @@
+
+import json
+import secrets
+from functools import wraps
+from threading import Lock
+from flask import current_app, g, request, make_response
+from sqlalchemy import inspect
+from werkzeug.http import unquote_etag, parse_date
+from werkzeug.local import LocalProxy
+from werkzeug.utils import import_string
+from .changes import on_committed_change
+from .http_cache import is_not_modified, wants_stream
+from .models import Recipe, Ingredient, Direction, Favorite
+
+
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Vary')
+
+
+class ResponseCache:
+    """Caches serialized 200 responses under tags.
+
+    Each tag (e.g. 'recipes', 'recipe:12', 'favorites:3') has a random generation
+    stored in the backend and every cache key embeds the generations of its tags.
+    Invalidating a tag replaces its generation, so all entries under it become
+    unreachable at once and simply age out of the backend.
+    """
+
+    def __init__(self, backend, enabled=True):
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+
+    def _generation(self, tag):
+        generation = self.backend.get(f'gen:{tag}')
+        if generation is None:
+            generation = secrets.token_hex(8).encode()
+            self.backend.set(f'gen:{tag}', generation)
+        return generation.decode()
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.set(f'gen:{tag}', secrets.token_hex(8).encode())
+
+    def key(self, path, tags, vary=''):
+        """Cache key of the response for `path` (with its query string) under `tags`."""
+        generations = ','.join(f'{tag}={self._generation(tag)}' for tag in tags)
+        return f'response:{path}|{vary}|{generations}'
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_ratio': self.hits / total if total else 0.0}
+
+    # get() and put() work on plain headers and bytes so the ASGI app (app/asgi.py) shares them
+    def get(self, key):
+        """(headers, body) stored under key, or None."""
+        entry = self.backend.get(key)
+        self._count(hit=entry is not None)
+        if entry is None:
+            return None
+        headers, body = entry.split(b'\n', 1)
+        return json.loads(headers), body
+
+    def put(self, key, headers, body):
+        headers = {name: headers[name] for name in CACHED_HEADERS if name in headers}
+        self.backend.set(key, json.dumps(headers).encode() + b'\n' + body)
+
+    def replay(self, key, if_none_match, if_modified_since):
+        """(status, headers, body) answering a request from the entry under key, or None on a miss.
+        Cached copies still answer If-None-Match / If-Modified-Since with a 304."""
+        entry = self.get(key)
+        if entry is None:
+            return None
+        headers, body = entry
+        etag, _ = unquote_etag(headers.get('ETag'))
+        if etag and is_not_modified(etag, parse_date(headers.get('Last-Modified')), if_none_match, if_modified_since):
+            return 304, {name: value for name, value in headers.items() if name != 'Content-Type'}, b''
+        return 200, headers, body
+
+    # respond() is the Flask side; the ASGI app (app/asgi.py) has its own cached() around key/replay/put
+    def respond(self, view, view_args, tags, vary=None):
+        """view(**view_args) served from the cache when possible (see cached())."""
+        if not self.enabled or wants_stream(request.args, request.headers.get('Accept')):
+            return view(**view_args)
+        key = g.response_cache_key = self.key(request.full_path, tags(**view_args), vary() if vary else '')
+        replayed = self.replay(key, request.headers.get('If-None-Match'), request.headers.get('If-Modified-Since'))
+        if replayed is not None:
+            status, headers, body = replayed
+            return current_app.response_class(body, status=status, headers=headers)
+        response = make_response(view(**view_args))
+        if response.status_code == 200 and not response.is_streamed:
+            self.put(key, response.headers, response.get_data())
+        return response
+
+    def variant(self, name, make, key=None):
+        """make() for the response being served, stored next to its cache entry under `name`
+        (e.g. its gzip body). Variants share the entry's tag generations, so they are
+        invalidated with it. Outside a cached view make() is simply called. `key` is the
+        entry's key where flask.g does not have it (the ASGI app)."""
+        key = key or g.get('response_cache_key')
+        if key is None:
+            return make()
+        key = f'{key}|{name}'
+        value = self.backend.get(key)
+        if value is None:
+            value = make()
+            self.backend.set(key, value)
+        return value
+
+
+def init_app(app):
+    app.extensions['response_cache'] = ResponseCache(
+        import_string(app.config['RESPONSE_CACHE_BACKEND'])(**app.config['RESPONSE_CACHE_OPTIONS']),
+        enabled=app.config['RESPONSE_CACHE_ENABLED'])
+
+
+# The current app's cache
+response_cache = LocalProxy(lambda: current_app.extensions['response_cache'])
+
+
+def cached(tags, vary=None):
+    """Cache a GET view in the current app's response cache. `tags(**view_args)` lists the
+    tags of the response, `vary()` adds anything besides the URL that changes it (e.g. the user)."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**view_args):
+            return response_cache.respond(view, view_args, tags, vary)
+        return wrapper
+    return decorator
+
+
+def recipe_tags(*recipe_ids):
+    # A recipe write invalidates that recipe and every recipe list
+    return ['recipes'] + [f'recipe:{recipe_id}' for recipe_id in recipe_ids]
+
+
+# Committed ORM writes invalidate exactly the recipes and favorites lists they touched
+def changed_tags(session, obj):
+    if isinstance(obj, (Recipe, Ingredient, Direction)):
+        return recipe_tags(*inspect(obj).attrs.recipe_id.history.sum())
+    if isinstance(obj, Favorite):
+        return [f'favorites:{obj.user_id}']
+    return None
+
+
+on_committed_change(changed_tags, lambda tags: response_cache.invalidate(*tags))
@@ -1,78 +1,81 @@
 
-from flask import request, render_template
-from . import app , db
-from .models import User, Recipe, Favorite, Ingredient, Direction
+from flask import Blueprint, current_app, request, render_template, Response, stream_with_context
+from sqlalchemy import select
+from . import db
+from .models import User, Recipe
 from .auth import basic_auth, token_auth
+from .importer import import_recipes, parse_ndjson
+from . import search, http_cache, handlers
+from .handlers import project_recipe, parse_recipe_list_args, parse_expand, recipe_list_query
+from .ingredients import ingredient_index
+from .popular import popular_recipes
+from .favorites import apply_favorites, remove_user_favorites
+from .shopping import merge_ingredients, validate_shopping_list
+from .recommendations import similar_recipes, recommended_recipes
+from .response_cache import response_cache, cached
+
+
+# Registered on the app by create_app()
+main_bp = Blueprint('main', __name__)
+users_bp = Blueprint('users', __name__)
+recipes_bp = Blueprint('recipes', __name__)
+favorites_bp = Blueprint('favorites', __name__)
 
 # Token route & endpoint
-@app.route('/token', methods=['GET'])
+@main_bp.route('/token', methods=['GET'])
 @basic_auth.login_required
 def get_token():
     user = basic_auth.current_user()
     return user.get_token()
 
 # Home
-@app.route("/")
+@main_bp.route("/")
 def index():
     return render_template('index.html')
 
 # [POST] /recipes
-@app.route('/recipes', methods=['POST'])
+@recipes_bp.route('/recipes', methods=['POST'])
 def create_recipe():
     if not request.is_json:
         return {"error": "Request must be in JSON format"}, 400
-    data = request.get_json()
-    required_fields = ['title', 'cook_time', 'prep_time', 'ingredients']
-    missing_fields = [field for field in required_fields if field not in data]
-    if missing_fields:
-        return {"error": f"Missing fields: {', '.join(missing_fields)}"}, 400
-    # Create the new recipe
-    new_recipe = Recipe(
-        title=data['title'],
-        cook_time=data.get('cook_time'),
-        prep_time=data.get('prep_time'),
-        tips=data.get('tips', '')
-    )
-    # Add ingredients to the recipe
-    for ingredient_data in data['ingredients']:
-        if 'name' not in ingredient_data or 'quantity' not in ingredient_data or 'units' not in ingredient_data:
-            return {"error": "Each ingredient must include a name, quantity, and units"}, 400
-        ingredient = Ingredient(
-            name=ingredient_data['name'],
-            quantity=ingredient_data['quantity'],
-            units=ingredient_data['units'],
-            recipe=new_recipe  # Link ingredient to the recipe
-        )
-        db.session.add(ingredient)
-    try:
-        db.session.add(new_recipe)
-        db.session.commit()
-        return {"success": f"Recipe {new_recipe.title} created successfully with ingredients"}, 201
-    except Exception as e:
-        db.session.rollback()
-        return {"error": str(e)}, 500
+    return handlers.create_recipe(db.session, request.get_json())
+
+# [POST] /recipes/bulk
+# Body is a JSON array of recipes, or one recipe per line with Content-Type: application/x-ndjson
+@recipes_bp.route('/recipes/bulk', methods=['POST'])
+@token_auth.login_required
+def bulk_create_recipes():
+    if request.mimetype == 'application/x-ndjson':
+        items = parse_ndjson(request.stream)
+    elif request.is_json:
+        items = request.get_json()
+        if not isinstance(items, list):
+            return {"error": "Request body must be a JSON array of recipes"}, 400
+    else:
+        return {"error": "Request must be in JSON or NDJSON format"}, 400
+    report = import_recipes(items, user_id=token_auth.current_user().user_id,
+                            chunk_size=current_app.config['BULK_IMPORT_CHUNK_SIZE'])
+    if not report['errors']:
+        return report, 201
+    return report, 200 if report['created'] else 400
 
 ## [GET] /users/me
-@app.route('/users/me', methods=['GET'])
+@users_bp.route('/users/me', methods=['GET'])
 @token_auth.login_required
 def get_me():
-    user = token_auth.current_user()
-    return user.to_dict()
+    return handlers.get_user(db.session, token_auth.current_user().user_id)
 
 ## [GET] /user/<user_id>
-@app.route('/users/<int:user_id>', methods=['GET'])
+@users_bp.route('/users/<int:user_id>', methods=['GET'])
 @token_auth.login_required
 def get_user(user_id):
-    user = db.session.get(User, user_id)
-    if user is None:
-        return {"error": "User not found"}, 404
-    return user.to_dict() , 200
+    return handlers.get_user(db.session, user_id)
 
 ## [PUT] /users/me
-@app.route('/users/me', methods=['PUT'])
+@users_bp.route('/users/me', methods=['PUT'])
 @token_auth.login_required
 def update_user():
-    user = token_auth.current_user()
+    user = db.session.get(User, token_auth.current_user().user_id)
     if user is None:
         return {"error": "User not found"}, 404
     data = request.json
@@ -92,109 +95,285 @@ def update_user():
     if password:
         user.set_password(password)
     db.session.commit()
+    user.forget_token()
     return {"success": "User updated successfully"}, 200
 
+## [GET] /users/me/recommendations?limit=10
+# Recipes like the user's favorites, precomputed by `flask build-recommendations`
+@users_bp.route('/users/me/recommendations', methods=['GET'])
+@token_auth.login_required
+def get_recommendations():
+    limit, error = parse_recommendations_limit()
+    if error:
+        return error
+    rows = recommended_recipes(token_auth.current_user().user_id, limit)
+    return {"recipes": [scored_recipe(row) for row in rows]}, 200
+
 ## [DELETE] /users/me
-@app.route('/users/me', methods=['DELETE'])
+@users_bp.route('/users/me', methods=['DELETE'])
 @token_auth.login_required
 def delete_user():
-    user = token_auth.current_user()
+    user = db.session.get(User, token_auth.current_user().user_id)
     if user is None:
         return {"error": "Disturbance in the force detected... You do not exist"}, 404
+    user.forget_token()
+    recipe_ids = remove_user_favorites(user.user_id)
     db.session.delete(user)
     db.session.commit()
+    popular_recipes.mark_dirty(recipe_ids)
     return {"success": "User deleted successfully"}, 200
 
 
 # Recipe routes & endpoints
 ## [GET] /recipes
-@app.route('/recipes', methods=['GET'])
+# ?limit=&cursor= pages in ?sort= order (pass back next_cursor), ?fields=title,cook_time
+# selects only those columns, ?stream=1 or Accept: application/x-ndjson streams NDJSON.
+# Filters: ?total_time_max=30 (also cook_time/prep_time, _min/_max), ?user_id=,
+# ?created_after=&created_before= (ISO-8601); sorts: see app/listing.py SORTS
+@recipes_bp.route('/recipes', methods=['GET'])
+@cached(lambda: ['recipes'])
 def get_recipes():
-    recipes = db.session.query(Recipe).all()
-    recipe_list = [recipe.to_dict() for recipe in recipes]
+    return list_recipes()
+
+
+## [GET] /users/<user_id>/recipes
+# Same filters, sorts and paging as GET /recipes
+@users_bp.route('/users/<int:user_id>/recipes', methods=['GET'])
+@cached(lambda user_id: ['recipes'])
+def get_user_recipes(user_id):
+    if db.session.get(User, user_id) is None:
+        return {"error": "User not found"}, 404
+    return list_recipes(user_id)
+
+
+def list_recipes(user_id=None):
+    parsed, error = parse_recipe_list_args(request.args, user_id)
+    if error:
+        return error
+    fields, expand, listing, limit = parsed
+    query = recipe_list_query(fields, expand, listing)
+
+    if http_cache.wants_stream(request.args, request.headers.get('Accept')):
+        if limit is not None:
+            query = query.limit(limit)
+        query = query.execution_options(yield_per=current_app.config['RECIPES_YIELD_PER'])
+
+        def generate():
+            rows = db.session.scalars(query) if expand else db.session.execute(query)
+            for row in rows:
+                yield current_app.json.dumps_bytes(project_recipe(row, fields, expand)) + b'\n'
+        response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    else:
+        limit = handlers.page_size(limit)
+        states = handlers.recipe_page_states(db.session, listing, limit)
+        response = http_cache.conditional_response(
+            states, lambda: handlers.recipe_page(db.session, fields, expand, listing, limit))
+    # JSON page or NDJSON stream depends on Accept, so shared caches must key on it
+    response.vary.add('Accept')
+    return response
+
+
+## [GET] /recipes/search?q=
+# Best matches first; page with ?limit= and the returned next_offset
+@recipes_bp.route('/recipes/search', methods=['GET'])
+def search_recipes():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return {"error": "Missing search query q"}, 400
+    if not search.is_available():
+        return {"error": "Search is only available on SQLite"}, 501
+    try:
+        limit = int(request.args.get('limit', current_app.config['RECIPES_PAGE_SIZE']))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return {"error": "limit and offset must be integers"}, 400
+    if limit < 1 or offset < 0:
+        return {"error": "limit must be positive and offset must not be negative"}, 400
+    limit = min(limit, current_app.config['RECIPES_MAX_PAGE_SIZE'])
+    rows = search.search_recipes(q, limit + 1, offset)
+    next_offset = offset + limit if len(rows) > limit else None
+    recipe_list = [project_recipe(row, Recipe.FIELDS) for row in rows[:limit]]
+    return {"recipes": recipe_list, "next_offset": next_offset}, 200
+
+
+## [GET] /recipes/by-ingredients?have=eggs,flour,milk&missing_max=1
+# Recipes you can cook with what you have, fewest missing ingredients first
+@recipes_bp.route('/recipes/by-ingredients', methods=['GET'])
+def get_recipes_by_ingredients():
+    have = [name for name in request.args.get('have', '').split(',') if name.strip()]
+    if not have:
+        return {"error": "Missing ingredients list have"}, 400
+    try:
+        missing_max = int(request.args.get('missing_max', 0))
+        limit = int(request.args.get('limit', current_app.config['RECIPES_PAGE_SIZE']))
+    except ValueError:
+        return {"error": "missing_max and limit must be integers"}, 400
+    if missing_max < 0 or limit < 1:
+        return {"error": "missing_max must not be negative and limit must be positive"}, 400
+    matches = ingredient_index.match(have, missing_max)[:min(limit, current_app.config['RECIPES_MAX_PAGE_SIZE'])]
+    if not matches:
+        return {"recipes": []}, 200
+    missing = dict(matches)
+    rows = db.session.execute(select(*Recipe.columns()).where(Recipe.recipe_id.in_(missing))).all()
+    rows_by_id = {row.recipe_id: row for row in rows}
+    recipe_list = []
+    for recipe_id, _ in matches:
+        if recipe_id in rows_by_id:
+            recipe = project_recipe(rows_by_id[recipe_id], Recipe.FIELDS)
+            recipe['missing_ingredients'] = missing[recipe_id]
+            recipe_list.append(recipe)
+    return {"recipes": recipe_list}, 200
+
+
+## [GET] /recipes/popular?limit=10
+# Most favorited recipes, served from the in-memory top list (app/popular.py)
+@recipes_bp.route('/recipes/popular', methods=['GET'])
+def get_popular_recipes():
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return {"error": "limit must be an integer"}, 400
+    if limit < 1:
+        return {"error": "limit must be a positive integer"}, 400
+    top = popular_recipes.top(min(limit, current_app.config['POPULAR_RECIPES_SIZE']))
+    if not top:
+        return {"recipes": []}, 200
+    rows = db.session.execute(select(*Recipe.columns()).where(Recipe.recipe_id.in_([recipe_id for recipe_id, _ in top]))).all()
+    rows_by_id = {row.recipe_id: row for row in rows}
+    recipe_list = []
+    for recipe_id, favorite_count in top:
+        if recipe_id in rows_by_id:
+            recipe = project_recipe(rows_by_id[recipe_id], Recipe.FIELDS)
+            recipe['favorite_count'] = favorite_count
+            recipe_list.append(recipe)
     return {"recipes": recipe_list}, 200
-    
+
+
+# [POST] /shopping-list
+# Body is {"recipes": [{"recipe_id": 1, "multiplier": 2}]}; ingredients are summed per name and unit
+@recipes_bp.route('/shopping-list', methods=['POST'])
+def build_shopping_list():
+    if not request.is_json:
+        return {"error": "Request must be in JSON format"}, 400
+    multipliers, error = validate_shopping_list(request.get_json(), current_app.config['SHOPPING_LIST_MAX_RECIPES'])
+    if error:
+        return {"error": error}, 400
+    items, missing = merge_ingredients(multipliers)
+    if len(missing) == len(multipliers):
+        return {"error": "None of the recipes were found", "missing": missing}, 404
+    return {"items": items, "missing": missing}, 200
+
+
+## [GET] /recipes/<recipe_id>/similar?limit=10
+# Neighbours precomputed by `flask build-recommendations` (app/recommendations.py)
+@recipes_bp.route('/recipes/<int:recipe_id>/similar', methods=['GET'])
+def get_similar_recipes(recipe_id):
+    limit, error = parse_recommendations_limit()
+    if error:
+        return error
+    rows = similar_recipes(recipe_id, limit)
+    if not rows and db.session.scalar(select(Recipe.recipe_id).where(Recipe.recipe_id == recipe_id)) is None:
+        return {"error": f"Recipe with ID {recipe_id} not found"}, 404
+    return {"recipes": [scored_recipe(row) for row in rows]}, 200
+
+
+def parse_recommendations_limit():
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return None, ({"error": "limit must be an integer"}, 400)
+    if limit < 1:
+        return None, ({"error": "limit must be a positive integer"}, 400)
+    return min(limit, current_app.config['RECOMMENDATIONS_SIZE']), None
+
+
+def scored_recipe(row):
+    recipe = project_recipe(row, Recipe.FIELDS)
+    recipe['score'] = round(row.score, 4)
+    return recipe
+
 
 ## [GET] /recipes/<recipe_id>
-@app.route('/recipes/<int:recipe_id>', methods=['GET'])
+@recipes_bp.route('/recipes/<int:recipe_id>', methods=['GET'])
+@cached(lambda recipe_id: [f'recipe:{recipe_id}'])
 def get_recipe(recipe_id):
-    recipe = db.session.get(Recipe, recipe_id)
-    if recipe:
-        return recipe.to_dict(), 200
-    else:
+    expand, error = parse_expand(request.args)
+    if error:
+        return error
+    state = handlers.recipe_state(db.session, recipe_id)
+    if state is None:
         return {'error': 'Recipe not found'}, 404
+    return http_cache.conditional_response([state[:2]], lambda: handlers.get_recipe(db.session, recipe_id, expand),
+                                           last_modified=state.updated_at)
 
 
 ## [PUT] /recipes/<recipe_id>
-@app.route('/recipes/<int:recipe_id>', methods=['PUT'])
+@recipes_bp.route('/recipes/<int:recipe_id>', methods=['PUT'])
 @token_auth.login_required
 def update_recipe(recipe_id):
-    recipe = db.session.get(Recipe, recipe_id)
-    if recipe is None:
-        return {"error": f'Recipe with ID {recipe_id} not found'}, 404
-    if recipe.user_id != token_auth.current_user().user_id:
-        return {"error": "Stop trying to edit a recipe you didn't post!"}, 403
-    data = request.json
-    # Update recipe details
-    recipe.update(**data)
-    return {"success": "Recipe updated successfully"}, 200
+    return handlers.update_recipe(db.session, recipe_id, request.json, token_auth.current_user().user_id)
 
 
 # [DELETE] /recipes/<int:recipe_id>
-@app.route('/recipes/<int:recipe_id>', methods=['DELETE'])
+@recipes_bp.route('/recipes/<int:recipe_id>', methods=['DELETE'])
 @token_auth.login_required
 def delete_recipe(recipe_id):
-    recipe = Recipe.query.get(recipe_id)
-    if recipe is None:
-        return {"error": "Recipe not found"}, 404
-    if recipe.user_id != token_auth.current_user().user_id:
-        return {"error": "You do not have permission to delete this recipe"}, 403
-    db.session.delete(recipe)
-    db.session.commit()
-    return {"success": "Recipe has been deleted successfully"}, 200
+    return handlers.delete_recipe(db.session, recipe_id, token_auth.current_user().user_id)
 
 # [GET] /favorites
-@app.route('/favorites', methods=['GET'])
+@favorites_bp.route('/favorites', methods=['GET'])
 @token_auth.login_required
+@cached(lambda: ['recipes', f'favorites:{token_auth.current_user().user_id}'],
+        vary=lambda: token_auth.current_user().user_id)
 def get_favorites():
-    current_user = token_auth.current_user()
-    favorite_recipes = db.session.query(Recipe).join(Favorite).filter(Favorite.user_id == current_user.user_id, Favorite.is_favorite == True).all()
-    favorite_list = []
-    for recipe in favorite_recipes:
-        favorite_list.append(recipe.to_dict())
-    return {"favorites": favorite_list}, 200
+    user_id = token_auth.current_user().user_id
+    states = handlers.favorite_states(db.session, user_id)
+    return http_cache.conditional_response(states, lambda: handlers.get_favorites(db.session, user_id), user_id)
+
+
+# [POST] /favorites/batch
+# Body is a JSON array of {"recipe_id": 1, "is_favorite": true}, applied in order
+@favorites_bp.route('/favorites/batch', methods=['POST'])
+@token_auth.login_required
+def batch_favorites():
+    if not request.is_json:
+        return {"error": "Request must be in JSON format"}, 400
+    operations = request.get_json()
+    if not isinstance(operations, list):
+        return {"error": "Request body must be a JSON array of favorites"}, 400
+    if len(operations) > current_app.config['FAVORITES_BATCH_MAX_SIZE']:
+        return {"error": f"At most {current_app.config['FAVORITES_BATCH_MAX_SIZE']} favorites per request"}, 413
+    report = apply_favorites(token_auth.current_user().user_id, operations)
+    if any('error' in result for result in report['results']) and not any('error' not in result for result in report['results']):
+        return report, 400
+    return report, 200
 
 
 # [POST] /favorites/<int:recipe_id>
-@app.route('/favorites/<int:recipe_id>', methods=['POST'])
+@favorites_bp.route('/favorites/<int:recipe_id>', methods=['POST'])
 @token_auth.login_required
 def toggle_favorite(recipe_id):
-    current_user = token_auth.current_user()
-    recipe = db.session.get(Recipe, recipe_id)
-    if recipe is None:
-        return {"error": f"Recipe with ID {recipe_id} not found"}, 404
-    favorite = db.session.query(Favorite).filter_by(user_id=current_user.user_id, recipe_id=recipe_id).first()
-    if favorite:
-        favorite.is_favorite = not favorite.is_favorite
-    else:
-        favorite = Favorite(user_id=current_user.user_id, recipe_id=recipe_id)
-        db.session.add(favorite)
-    db.session.commit()
-    return {"success": "Favorite status updated successfully"}, 200
+    return handlers.toggle_favorite(db.session, token_auth.current_user().user_id, recipe_id)
 
 
 # [DELETE] /favorites/<recipe_id>
-@app.route('/favorites/<int:recipe_id>', methods=['DELETE'])
+@favorites_bp.route('/favorites/<int:recipe_id>', methods=['DELETE'])
 @token_auth.login_required
 def remove_favorite(recipe_id):
-    current_user = token_auth.current_user()
-    favorite = db.session.query(Favorite).filter_by(user_id=current_user.user_id, recipe_id=recipe_id).first()
-    if favorite:
-        db.session.delete(favorite)
-        db.session.commit()
-        return {"success": "Recipe removed from favorites successfully"}, 200
-    else:
-        return {"error": "Recipe is not in your favorites"}, 404
+    return handlers.remove_favorite(db.session, token_auth.current_user().user_id, recipe_id)
+
 
+# [GET] /cache/stats
+@main_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return response_cache.stats(), 200
 
 
+# [GET] /metrics
+# Prometheus text format; 404 unless METRICS_ENABLED
+@main_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    if not current_app.config['METRICS_ENABLED']:
+        return {"error": "Metrics are disabled"}, 404
+    from . import metrics
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
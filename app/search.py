@@ -0,0 +1,73 @@
+
+from sqlalchemy import DDL, bindparam, event, inspect, text
+from sqlalchemy.orm import Session
+from . import db
+from .models import Recipe, Ingredient, Direction
+
+
+# recipe_search is a standalone FTS5 table keyed by rowid = recipe_id. Documents are
+# rebuilt once per changed recipe after each flush (and by the bulk importer after its
+# inserts), not by per-row triggers on ingredient/direction: those re-ran the
+# group_concat over all of a recipe's children for every child row written.
+SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS recipe_search USING fts5("
+    "title, tips, ingredients, directions, tokenize = 'porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS recipe_search_recipe_ad AFTER DELETE ON recipe BEGIN"
+    " DELETE FROM recipe_search WHERE rowid = OLD.recipe_id; END",
+]
+
+# db.create_all() builds the index too; real databases get it from the migrations
+for statement in SEARCH_DDL:
+    event.listen(db.metadata, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+
+DELETE_DOCUMENTS = text("DELETE FROM recipe_search WHERE rowid IN :recipe_ids").bindparams(
+    bindparam('recipe_ids', expanding=True))
+INSERT_DOCUMENTS = text(
+    "INSERT INTO recipe_search (rowid, title, tips, ingredients, directions)"
+    " SELECT recipe.recipe_id, recipe.title, recipe.tips,"
+    " (SELECT group_concat(name, ' ') FROM ingredient WHERE ingredient.recipe_id = recipe.recipe_id),"
+    " (SELECT group_concat(instruction, ' ') FROM direction WHERE direction.recipe_id = recipe.recipe_id)"
+    " FROM recipe WHERE recipe.recipe_id IN :recipe_ids"
+).bindparams(bindparam('recipe_ids', expanding=True))
+
+
+def refresh_documents(connection, recipe_ids):
+    """Rebuild the search documents of recipe_ids with one DELETE and one INSERT ... SELECT."""
+    recipe_ids = sorted(recipe_ids)
+    if not recipe_ids or connection.dialect.name != 'sqlite':
+        return
+    connection.execute(DELETE_DOCUMENTS, {'recipe_ids': recipe_ids})
+    connection.execute(INSERT_DOCUMENTS, {'recipe_ids': recipe_ids})
+
+
+@event.listens_for(Session, 'after_flush')
+def refresh_changed_documents(session, flush_context):
+    recipe_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Recipe, Ingredient, Direction)):
+            # a child moved to another recipe changes both documents
+            recipe_ids.update(inspect(obj).attrs.recipe_id.history.sum())
+            recipe_ids.add(obj.recipe_id)
+    recipe_ids.discard(None)
+    refresh_documents(session.connection(), recipe_ids)
+
+
+def is_available():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def to_match_query(q):
+    # Quote every term so user input can't inject FTS5 syntax; terms are ANDed
+    terms = [term.replace('"', '""') for term in q.split()]
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def search_recipes(q, limit, offset=0):
+    # bm25() is lower-is-better; title matches weigh most, then ingredients
+    query = text(
+        "SELECT recipe.recipe_id, recipe.title, recipe.cook_time, recipe.prep_time, recipe.total_time, recipe.tips,"
+        " recipe.created_at, recipe.user_id, bm25(recipe_search, 10.0, 2.0, 5.0, 1.0) AS rank"
+        " FROM recipe_search JOIN recipe ON recipe.recipe_id = recipe_search.rowid"
+        " WHERE recipe_search MATCH :match ORDER BY rank LIMIT :limit OFFSET :offset"
+    ).columns(*Recipe.columns())
+    return db.session.execute(query, {'match': to_match_query(q), 'limit': limit, 'offset': offset}).all()
@@ -0,0 +1,118 @@
+import math
+import re
+from functools import cache
+from sqlalchemy import select
+from . import db
+from .ingredients import normalize_ingredient, singular
+from .models import Recipe, Ingredient
+
+
+@cache
+def load_numpy():
+    # optional speedup, imported on first use: web workers that never need it don't load it
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+# Unit as written (lower case, singular) -> (canonical unit, factor to the canonical unit).
+# Mass adds up in grams, volume in millilitres; anything else only loses its case and plural
+UNITS = {
+    'g': ('g', 1.0), 'gr': ('g', 1.0), 'gram': ('g', 1.0), 'gramme': ('g', 1.0),
+    'kg': ('g', 1000.0), 'kilo': ('g', 1000.0), 'kilogram': ('g', 1000.0),
+    'mg': ('g', 0.001), 'milligram': ('g', 0.001),
+    'oz': ('g', 28.349523), 'ounce': ('g', 28.349523),
+    'lb': ('g', 453.59237), 'lbs': ('g', 453.59237), 'pound': ('g', 453.59237),
+    'ml': ('ml', 1.0), 'milliliter': ('ml', 1.0), 'millilitre': ('ml', 1.0),
+    'cl': ('ml', 10.0), 'dl': ('ml', 100.0),
+    'l': ('ml', 1000.0), 'liter': ('ml', 1000.0), 'litre': ('ml', 1000.0),
+    'tsp': ('ml', 4.928922), 'teaspoon': ('ml', 4.928922),
+    'tbsp': ('ml', 14.786765), 'tbs': ('ml', 14.786765), 'tablespoon': ('ml', 14.786765),
+    'fl oz': ('ml', 29.573530), 'fluid ounce': ('ml', 29.573530),
+    'cup': ('ml', 236.588237),
+    'pt': ('ml', 473.176473), 'pint': ('ml', 473.176473),
+    'qt': ('ml', 946.352946), 'quart': ('ml', 946.352946),
+    'gal': ('ml', 3785.411784), 'gallon': ('ml', 3785.411784),
+    'piece': ('', 1.0), 'pc': ('', 1.0), 'pcs': ('', 1.0), 'whole': ('', 1.0),
+}
+
+
+def canonical_unit(units):
+    """(canonical unit, factor) for a free-text unit, e.g. 'Tablespoons' -> ('ml', 14.79)."""
+    key = ' '.join(singular(word) for word in re.findall(r'[a-z]+', (units or '').lower()))
+    return UNITS.get(key, (key, 1.0))
+
+
+def validate_shopping_list(data, max_recipes):
+    """{recipe_id: multiplier} from {"recipes": [{recipe_id, multiplier}]}, or an error string."""
+    if not isinstance(data, dict) or not isinstance(data.get('recipes'), list) or not data['recipes']:
+        return None, 'recipes must be a non-empty list'
+    if len(data['recipes']) > max_recipes:
+        return None, f'At most {max_recipes} recipes per shopping list'
+    multipliers = {}
+    for item in data['recipes']:
+        if not isinstance(item, dict):
+            return None, 'Each recipe must be a JSON object'
+        recipe_id, multiplier = item.get('recipe_id'), item.get('multiplier', 1)
+        if not isinstance(recipe_id, int) or isinstance(recipe_id, bool):
+            return None, 'recipe_id must be an integer'
+        if not isinstance(multiplier, (int, float)) or isinstance(multiplier, bool) \
+                or not math.isfinite(multiplier) or multiplier <= 0:
+            return None, 'multiplier must be a positive number'
+        # the same recipe listed twice is cooked twice
+        multipliers[recipe_id] = multipliers.get(recipe_id, 0) + multiplier
+    return multipliers, None
+
+
+def sum_by_key(keys, quantities, scales, size):
+    """totals[k] = sum of quantity * scale over the rows with key k."""
+    numpy = load_numpy()
+    if numpy is not None:
+        weights = numpy.multiply(numpy.asarray(quantities, dtype=float), numpy.asarray(scales, dtype=float))
+        return numpy.bincount(numpy.asarray(keys, dtype=numpy.intp), weights=weights, minlength=size).tolist()
+    totals = [0.0] * size
+    for key, quantity, scale in zip(keys, quantities, scales):
+        totals[key] += quantity * scale
+    return totals
+
+
+def merge_ingredients(multipliers):
+    """One shopping list for {recipe_id: multiplier}; returns (items, missing recipe ids).
+
+    Every ingredient row comes from one query. Rows are keyed by canonical ingredient
+    name and unit, then all quantities are scaled and summed in one batch.
+    """
+    rows = db.session.execute(
+        select(Recipe.recipe_id, Ingredient.name, Ingredient.quantity, Ingredient.units)
+        .outerjoin(Ingredient, Ingredient.recipe_id == Recipe.recipe_id)
+        .where(Recipe.recipe_id.in_(multipliers)))
+    found = set()
+    names, units_seen = {}, {}            # raw name / unit as written -> canonical
+    item_ids, items = {}, []              # (name, unit) -> index in items
+    keys, quantities, scales = [], [], []
+    for recipe_id, name, quantity, units in rows:
+        found.add(recipe_id)
+        if name is None:
+            continue
+        canonical = names.get(name)
+        if canonical is None:
+            canonical = names[name] = normalize_ingredient(name) or name.strip().lower()
+        converted = units_seen.get(units)
+        if converted is None:
+            converted = units_seen[units] = canonical_unit(units)
+        unit, factor = converted
+        item_id = item_ids.get((canonical, unit))
+        if item_id is None:
+            item_id = item_ids[(canonical, unit)] = len(items)
+            items.append({'name': canonical, 'quantity': None, 'units': unit})
+        if quantity is not None:
+            keys.append(item_id)
+            quantities.append(quantity)
+            scales.append(factor * multipliers[recipe_id])
+    totals = sum_by_key(keys, quantities, scales, len(items))
+    for item_id in set(keys):
+        items[item_id]['quantity'] = round(totals[item_id], 2)
+    items.sort(key=lambda item: (item['name'], item['units']))
+    return items, sorted(set(multipliers) - found)
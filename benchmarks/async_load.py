@@ -0,0 +1,66 @@
+"""Throughput and latency of gunicorn sync workers vs the ASGI app as concurrency grows.
+
+    python -m benchmarks.async_load [workers] [seconds]
+
+Both servers get the same number of worker processes. Sync workers handle one
+request each, so past `workers` concurrent clients requests queue; an ASGI
+worker keeps accepting them and interleaves them while they wait on I/O. With
+a local SQLite file the work is CPU bound and the two end up close; the gap
+opens with a networked database (ASYNC_DATABASE_URL=postgresql+asyncpg://...)
+or slow clients.
+"""
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+
+from .common import setup_app, synthetic_recipe
+from .servers import running_server
+
+CONCURRENCY = (1, 4, 16, 64)
+PATHS = ('/recipes?limit=50', '/recipes/7?expand=ingredients,directions', '/recipes/42')
+
+
+def load(base_url, concurrency, seconds):
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+
+    def client(n):
+        local = []
+        i = n
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            urllib.request.urlopen(base_url + PATHS[i % len(PATHS)], timeout=30).read()
+            local.append(time.perf_counter() - start)
+            i += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    p95 = statistics.quantiles(latencies, n=20)[18] * 1000 if len(latencies) > 1 else 0
+    return len(latencies) / seconds, p95
+
+
+def main(workers=1, seconds=5):
+    app, db = setup_app()
+    from app.importer import import_recipes
+    with app.app_context():
+        import_recipes(synthetic_recipe(i) for i in range(1000))
+    # Measure the servers, not the response cache
+    os.environ['RESPONSE_CACHE_ENABLED'] = '0'
+    for kind in ('gunicorn-sync', 'uvicorn-asgi'):
+        with running_server(kind, workers) as base_url:
+            for concurrency in CONCURRENCY:
+                rps, p95 = load(base_url, concurrency, seconds)
+                print(f'{kind:<14} workers={workers} concurrency={concurrency:<3} rps={rps:7.1f} p95={p95:7.1f}ms')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,34 @@
+"""POST /recipes/bulk throughput in recipes per second.
+
+    python -m benchmarks.bulk_import [recipes]
+"""
+import base64
+import json
+import sys
+import time
+
+from .common import setup_app, synthetic_recipe
+
+
+def main(count=50000):
+    app, db = setup_app()
+    from app.models import User
+    with app.app_context():
+        db.session.add(User(username='bench', email='bench@example.com', password='bench'))
+        db.session.commit()
+    client = app.test_client()
+    basic = {'Authorization': 'Basic ' + base64.b64encode(b'bench@example.com:bench').decode()}
+    token = client.get('/token', headers=basic).json['token']
+    body = '\n'.join(json.dumps(synthetic_recipe(i)) for i in range(count))
+
+    start = time.perf_counter()
+    response = client.post('/recipes/bulk', data=body, content_type='application/x-ndjson',
+                           headers={'Authorization': f'Bearer {token}'})
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 201, response.json
+    print(f"chunk_size={app.config['BULK_IMPORT_CHUNK_SIZE']} recipes={count} elapsed={elapsed:.2f}s")
+    print(f'recipes/s={count / elapsed:.0f}')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,62 @@
+import os
+import random
+import tempfile
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+def setup_app():
+    # Point the app at a throwaway SQLite file before config.py is imported
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    # Benchmarks measure the routes, not the admission limits (servers inherit this too)
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    from app import create_app, db
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    return app, db
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def seed_recipes(db, count, ingredients_per_recipe=8, directions_per_recipe=5):
+    from app.models import Recipe, Ingredient, Direction
+    for i in range(count):
+        recipe = Recipe(title=f'Recipe {i}', cook_time=i % 90, prep_time=i % 45, tips='Season to taste.')
+        db.session.add(recipe)
+        for j in range(ingredients_per_recipe):
+            recipe.ingredients.append(Ingredient(name=f'Ingredient {j}', quantity=j + 1, units='g'))
+        for step in range(1, directions_per_recipe + 1):
+            recipe.directions.append(Direction(step_number=step, instruction=f'Step {step}.', recipe_id=None))
+    db.session.commit()
+
+
+WORDS = ('chicken', 'garlic', 'lemon', 'basil', 'tomato', 'onion', 'butter', 'flour', 'sugar', 'egg',
+         'rice', 'beans', 'pepper', 'cumin', 'ginger', 'honey', 'salmon', 'potato', 'cheese', 'spinach')
+
+
+def synthetic_recipe(i, rng=None):
+    rng = rng or random.Random(i)
+    return {
+        'title': f"{' '.join(rng.sample(WORDS, 3)).title()} {i}",
+        'cook_time': rng.randint(0, 120),
+        'prep_time': rng.randint(0, 60),
+        'tips': f'Use fresh {rng.choice(WORDS)}.',
+        'ingredients': [{'name': name, 'quantity': rng.randint(1, 500), 'units': 'g'}
+                        for name in rng.sample(WORDS, 8)],
+        'directions': [{'step_number': step, 'instruction': f'Add the {rng.choice(WORDS)} and stir.'}
+                       for step in range(1, 6)],
+    }
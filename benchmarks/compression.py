@@ -0,0 +1,42 @@
+"""Response compression of a 1k-recipe payload: size and cost per encoding and level.
+
+    python -m benchmarks.compression [seconds]
+
+`ratio` and `compress` cover the encoder alone on GET /recipes?limit=1000&expand=...,
+`endpoint` is the full request with the response cache on (the compressed body is
+kept next to the cached one) and off (compressed on every request).
+"""
+import sys
+
+from .common import setup_app, synthetic_recipe
+from .serialization import rate
+
+PATH = '/recipes?limit=1000&expand=ingredients,directions'
+
+
+def main(seconds=2.0):
+    app, db = setup_app()
+    from app.compression import ENCODERS, compress
+    from app.importer import import_recipes
+    with app.app_context():
+        import_recipes(synthetic_recipe(i) for i in range(1000))
+    client = app.test_client()
+    body = client.get(PATH).get_data()
+    print(f'identity {len(body):>10} bytes')
+
+    for encoding in ENCODERS:
+        for level in (1, 6, 9):
+            size = len(compress(body, encoding, level))
+            per_second = rate(lambda: compress(body, encoding, level), seconds)
+            print(f'{encoding:<8} level={level}  {size:>9} bytes  ratio={len(body) / size:5.1f}  compress={per_second:7.1f}/s')
+
+    for encoding in ('identity', *ENCODERS):
+        headers = {'Accept-Encoding': encoding}
+        for cached in (True, False):
+            app.extensions['response_cache'].enabled = cached
+            endpoint = rate(lambda: client.get(PATH, headers=headers).get_data(), seconds)
+            print(f"{encoding:<8} endpoint cache={'on ' if cached else 'off'} {endpoint:7.1f} responses/s")
+
+
+if __name__ == '__main__':
+    main(*map(float, sys.argv[1:]))
@@ -0,0 +1,137 @@
+"""Seeded synthetic cookbook: users, recipes with ingredients and directions, favorites.
+
+    python -m benchmarks.dataset [10k|100k|1m] [seed]
+
+The same scale and seed always produce the same rows. A generated database is
+kept in the temp directory and copied for each run, so the 1M build (several
+minutes) happens once and every run starts from identical data.
+"""
+import hashlib
+import os
+import random
+import secrets
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from .common import synthetic_recipe
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}   # recipes
+RECIPES_PER_USER = 100
+FAVORITES_PER_USER = 200
+# Synthetic recipes draw from 20 ingredient words, so nearly every pair shares some and
+# `flask build-recommendations` is quadratic here; larger scales leave the tables empty
+RECOMMENDATIONS_MAX_RECIPES = 20_000
+PASSWORD = 'benchmark'
+
+
+def user_email(user_id):
+    return f'user{user_id}@example.com'
+
+
+def cache_path(scale, seed, metadata):
+    # Keyed by the schema too, so a new column or index doesn't reuse a stale copy
+    schema = hashlib.sha1(';'.join(
+        f'{table.name}:{",".join(table.columns.keys())}:{",".join(sorted(index.name for index in table.indexes))}'
+        for table in metadata.sorted_tables).encode()).hexdigest()[:8]
+    return os.path.join(tempfile.gettempdir(), f'cookbook-bench-{scale}-{seed}-{schema}.db')
+
+
+def use_dataset(scale='10k', seed=1, rebuild=False):
+    """Point the app at a fresh copy of the dataset, generating it first if needed; returns (app, db)."""
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    # Benchmarks measure the routes, not the admission limits (servers inherit this too)
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    from app import create_app, db
+    from config import Config
+
+    # config.py reads DATABASE_URL once, at import; later calls need the path passed in
+    class DatasetConfig(Config):
+        SQLALCHEMY_DATABASE_URI = os.environ['DATABASE_URL']
+
+    app = create_app(DatasetConfig)
+    cached = cache_path(scale, seed, db.metadata)
+    if os.path.exists(cached) and not rebuild:
+        shutil.copyfile(cached, path)
+        return app, db
+    with app.app_context():
+        db.create_all()
+        generate(db, SCALES[scale], seed)
+        db.engine.dispose()
+    shutil.copyfile(path, cached + '.tmp')
+    os.replace(cached + '.tmp', cached)
+    return app, db
+
+
+def generate(db, recipe_count, seed):
+    from sqlalchemy import insert, update
+    from app.importer import import_recipes
+    from app.models import User, Recipe, Favorite
+    from app.passwords import hash_password
+    from app.popular import reconcile_favorite_counts
+    from app.recommendations import build_recommendations
+
+    rng = random.Random(seed)
+    user_count = max(recipe_count // RECIPES_PER_USER, 10)
+    password_hash = hash_password(PASSWORD)   # one scrypt run, shared by every user
+    expiration = datetime.now(timezone.utc) + timedelta(days=365)
+    for start in range(1, user_count + 1, 10_000):
+        db.session.execute(insert(User), [{
+            'username': f'user{user_id}',
+            'email': user_email(user_id),
+            'password': password_hash,
+            'token': f'bench-token-{user_id}',
+            'token_expiration': expiration,
+        } for user_id in range(start, min(start + 10_000, user_count + 1))])
+    db.session.commit()
+
+    import_recipes((synthetic_recipe(i, rng) for i in range(recipe_count)), chunk_size=5000)
+    db.session.execute(update(Recipe).values(user_id=Recipe.recipe_id % user_count + 1))
+    db.session.commit()
+
+    favorites = []
+    for user_id in range(1, user_count + 1):
+        for recipe_id in rng.sample(range(1, recipe_count + 1), min(FAVORITES_PER_USER, recipe_count)):
+            favorites.append({'user_id': user_id, 'recipe_id': recipe_id, 'is_favorite': rng.random() < 0.9})
+        if len(favorites) >= 50_000:
+            db.session.execute(insert(Favorite), favorites)
+            favorites = []
+    if favorites:
+        db.session.execute(insert(Favorite), favorites)
+    db.session.commit()
+    reconcile_favorite_counts()
+    if recipe_count <= RECOMMENDATIONS_MAX_RECIPES:
+        build_recommendations()
+    return {'users': user_count, 'recipes': recipe_count}
+
+
+def add_throwaway_users(db, count):
+    """Users with ready-made tokens for DELETE /users/me; returns their tokens."""
+    from sqlalchemy import insert, func, select
+    from app.models import User
+    first = db.session.scalar(select(func.max(User.user_id))) + 1
+    password_hash = db.session.scalar(select(User.password).limit(1))
+    tokens = [secrets.token_hex(16) for _ in range(count)]
+    db.session.execute(insert(User), [{
+        'username': f'throwaway{first + i}',
+        'email': f'throwaway{first + i}@example.com',
+        'password': password_hash,
+        'token': token,
+        'token_expiration': datetime.now(timezone.utc) + timedelta(days=1),
+    } for i, token in enumerate(tokens)])
+    db.session.commit()
+    return tokens
+
+
+def main(scale='10k', seed=1):
+    started = time.perf_counter()
+    app, db = use_dataset(scale, int(seed), rebuild=True)
+    print(f'{scale} dataset (seed {seed}) built in {time.perf_counter() - started:.1f}s: '
+          f'{cache_path(scale, int(seed), db.metadata)}')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,38 @@
+"""GET /token logins per second, per password hashing worker.
+
+    python -m benchmarks.logins [logins]
+
+Set PASSWORD_HASH_METHOD / PASSWORD_HASH_WORKERS to compare hash parameters.
+"""
+import base64
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import setup_app
+
+
+def main(logins=200):
+    app, db = setup_app()
+    from app.models import User
+    with app.app_context():
+        db.session.add(User(username='bench', email='bench@example.com', password='correct horse'))
+        db.session.commit()
+    headers = {'Authorization': 'Basic ' + base64.b64encode(b'bench@example.com:correct horse').decode()}
+    workers = app.config['PASSWORD_HASH_WORKERS']
+
+    def login(_):
+        return app.test_client().get('/token', headers=headers).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers * 2) as pool:
+        statuses = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    rate = statuses.count(200) / elapsed
+    print(f"method={app.config['PASSWORD_HASH_METHOD']} workers={workers}")
+    print(f'logins={logins} ok={statuses.count(200)} shed={statuses.count(503)} elapsed={elapsed:.2f}s')
+    print(f'logins/s={rate:.1f} logins/s/core={rate / workers:.1f}')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
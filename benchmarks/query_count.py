@@ -0,0 +1,32 @@
+"""SQL statements issued by GET /recipes?expand=ingredients,directions per page size.
+
+    python -m benchmarks.query_count
+
+With selectinload the count must stay flat as the page grows (SQLAlchemy
+splits the IN list every 500 parents, so pages stop at 500).
+"""
+from .common import setup_app, count_queries, seed_recipes
+
+PAGE_SIZES = (1, 10, 100, 500)
+
+
+def main():
+    app, db = setup_app()
+    with app.app_context():
+        seed_recipes(db, max(PAGE_SIZES))
+        engine = db.engine
+    client = app.test_client()
+    counts = {}
+    for limit in PAGE_SIZES:
+        with app.app_context(), count_queries(engine) as statements:
+            response = client.get(f'/recipes?limit={limit}&expand=ingredients,directions')
+            assert response.status_code == 200
+            assert len(response.json['recipes']) == limit
+        counts[limit] = len(statements)
+        print(f'limit={limit:<5} queries={counts[limit]}')
+    if len(set(counts.values())) != 1:
+        raise SystemExit('query count grows with page size (N+1)')
+
+
+if __name__ == '__main__':
+    main()
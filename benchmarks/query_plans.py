@@ -0,0 +1,171 @@
+"""EXPLAIN QUERY PLAN for every statement the routes in app/routes.py issue.
+
+    python -m benchmarks.query_plans [-v]
+
+Exits non-zero when a statement falls back to a full table scan, or when a
+route is not exercised here. tests/test_query_plans.py runs the same check.
+A SCAN is accepted when the statement is bounded by LIMIT, walks the table or
+an index in the requested order (no temp b-tree sort) and has no condition on
+that table left to filter the rows it walks. ALLOWED_SCANS lists the unfiltered
+walks of a whole table that are accepted without a LIMIT.
+"""
+import base64
+import re
+import sys
+from collections import defaultdict
+
+from flask import request
+from sqlalchemy import event
+
+from .common import setup_app, synthetic_recipe
+
+# (endpoint, table): reason. Covers walks of the whole table only, never a filtered scan.
+ALLOWED_SCANS = {
+    ('get_recipes_by_ingredients', 'ingredient'): 'full rebuild of the in-memory ingredient index',
+    ('get_recipes', 'recipe'): 'stream=1 exports the whole catalog by design',
+}
+
+
+def requests_to_run(token):
+    auth = {'Authorization': f'Bearer {token}'}
+    recipe = {'title': 'Plan check', 'cook_time': 1, 'prep_time': 1,
+              'ingredients': [{'name': 'salt', 'quantity': 1, 'units': 'g'}]}
+    return [
+        ('GET', '/', {}),
+        ('GET', '/token', {'headers': {'Authorization': 'Basic ' + base64.b64encode(b'plan@example.com:plan').decode()}}),
+        ('GET', '/users/me', {'headers': auth}),
+        ('GET', '/users/1', {'headers': auth}),
+        ('GET', '/users/me/recommendations', {'headers': auth}),
+        ('PUT', '/users/me', {'headers': auth, 'json': {'username': 'plan2', 'email': 'plan@example.com'}}),
+        ('POST', '/recipes', {'json': recipe}),
+        ('POST', '/recipes/bulk', {'headers': auth, 'json': [recipe]}),
+        ('GET', '/recipes', {}),
+        ('GET', '/recipes?limit=5&cursor=10&fields=title', {}),
+        ('GET', '/recipes?limit=5&expand=ingredients,directions', {}),
+        ('GET', '/recipes?stream=1&limit=5', {}),
+        ('GET', '/recipes?total_time_max=30&sort=total_time&limit=5', {}),
+        ('GET', '/recipes?total_time_min=20&total_time_max=60&sort=-total_time&limit=5&cursor=WzQwLCAxMF0', {}),
+        ('GET', '/recipes?cook_time_min=10&cook_time_max=40&limit=5', {}),
+        ('GET', '/recipes?prep_time_max=10&limit=5', {}),
+        ('GET', '/recipes?cook_time_max=40&limit=5', {}),
+        ('GET', '/recipes?cook_time_max=40&prep_time_max=10&limit=5&cursor=10', {}),
+        ('GET', '/recipes?user_id=1&sort=-created_at&limit=5', {}),
+        ('GET', '/recipes?created_after=2020-01-01T00:00:00Z&sort=-created_at&limit=5', {}),
+        ('GET', '/recipes?created_after=2020-01-01T00:00:00Z&created_before=2100-01-01&limit=5', {}),
+        ('GET', '/users/1/recipes?sort=total_time&total_time_max=90&limit=5', {}),
+        ('GET', '/users/1/recipes?cook_time_max=30&limit=5', {}),
+        ('GET', '/recipes/search?q=garlic', {}),
+        ('GET', '/recipes/by-ingredients?have=garlic,lemon,basil,tomato,onion&missing_max=8', {}),
+        ('POST', '/shopping-list', {'json': {'recipes': [{'recipe_id': 3, 'multiplier': 2}, {'recipe_id': 4}]}}),
+        ('GET', '/recipes/3/similar?limit=5', {}),
+        ('GET', '/recipes/3', {}),
+        ('GET', '/recipes/3?expand=ingredients,directions', {}),
+        ('PUT', '/recipes/1', {'headers': auth, 'json': {'title': 'Renamed'}}),
+        ('POST', '/favorites/1', {'headers': auth}),
+        ('POST', '/favorites/2', {'headers': auth}),
+        ('GET', '/favorites', {'headers': auth}),
+        ('DELETE', '/favorites/2', {'headers': auth}),
+        ('POST', '/favorites/batch', {'headers': auth, 'json': [{'recipe_id': 3}, {'recipe_id': 4}, {'recipe_id': 1, 'is_favorite': False}]}),
+        ('GET', '/recipes/popular', {}),
+        ('DELETE', '/recipes/2', {'headers': auth}),
+        ('GET', '/cache/stats', {}),
+        ('GET', '/metrics', {}),
+        ('DELETE', '/users/me', {'headers': auth}),
+    ]
+
+
+def full_scans(connection, statement, parameters, allowed=()):
+    plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    details = [row[-1] for row in plan]
+    sorted_in_temp = any('USE TEMP B-TREE' in detail for detail in details)
+    bounded = re.search(r'\bLIMIT\b', statement) is not None and not sorted_in_temp
+    where = re.split(r'\bWHERE\b', statement, maxsplit=1)[1:]
+    where = where[0] if where else ''
+    scans = []
+    for detail in details:
+        match = re.match(r'SCAN (\w+)', detail)
+        if not match or match.group(1) == 'CONSTANT' or 'VIRTUAL TABLE' in detail:
+            continue
+        # An ordered walk stops after LIMIT rows only if every row it reads is returned;
+        # a condition on the scanned table can make it read the whole table first.
+        filtered = re.search(rf'\b{match.group(1)}\.', where) is not None
+        if filtered or not (bounded or match.group(1) in allowed):
+            scans.append((match.group(1), detail))
+    return details, scans
+
+
+def check_plans(app, verbose=False):
+    """Seed the app's empty database, run requests_to_run() and EXPLAIN every statement they issue.
+
+    Returns (statements checked, endpoints covered, failures); a failure is (endpoint, detail),
+    either a full scan or a route that requests_to_run() does not exercise.
+    """
+    from app import db, view_name
+    from app.importer import import_recipes
+    from app.models import User
+    from app.recommendations import build_recommendations
+    app.extensions['response_cache'].enabled = False
+    with app.app_context():
+        db.session.add(User(username='plan', email='plan@example.com', password='plan'))
+        db.session.commit()
+        user_id = db.session.query(User).one().user_id
+        import_recipes((synthetic_recipe(i) for i in range(50)), user_id=user_id)
+        build_recommendations(workers=1)
+        engine = db.engine
+    client = app.test_client()
+    token = client.get('/token', headers={
+        'Authorization': 'Basic ' + base64.b64encode(b'plan@example.com:plan').decode()}).json['token']
+
+    statements = defaultdict(set)
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+            if executemany:
+                parameters = parameters[0]
+            statements[(view_name(request.endpoint), statement)].add(tuple(parameters) if isinstance(parameters, (list, tuple)) else parameters)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for method, url, kwargs in requests_to_run(token):
+            response = client.open(url, method=method, **kwargs)
+            response.get_data()
+            if response.status_code >= 500:
+                raise RuntimeError(f'{method} {url} failed with {response.status_code}: {response.get_data(as_text=True)}')
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    failures = []
+    covered = set()
+    with engine.connect() as connection:
+        for (endpoint, statement), parameter_sets in sorted(statements.items(), key=lambda item: str(item[0])):
+            covered.add(endpoint)
+            allowed = {table for allowed_endpoint, table in ALLOWED_SCANS if allowed_endpoint == endpoint}
+            details, scans = full_scans(connection, statement, next(iter(parameter_sets)), allowed)
+            if verbose or scans:
+                print(f"[{endpoint}] {' '.join(statement.split())}")
+                for detail in details:
+                    print(f'    {detail}')
+            failures.extend((endpoint, detail) for _, detail in scans)
+
+    routes = {view_name(rule.endpoint) for rule in app.url_map.iter_rules() if rule.endpoint != 'static'}
+    adapter = app.url_map.bind('localhost')
+    exercised = {view_name(adapter.match(url.split('?')[0], method=method)[0]) for method, url, _ in requests_to_run(token)}
+    failures.extend((endpoint, 'route not exercised by benchmarks/query_plans.py') for endpoint in sorted(routes - exercised))
+    return len(statements), covered, failures
+
+
+def main(verbose=False):
+    app, _ = setup_app()
+    try:
+        statements, covered, failures = check_plans(app, verbose)
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    print(f'{statements} statements from {len(covered)} endpoints checked')
+    for endpoint, detail in failures:
+        print(f'FAIL [{endpoint}] {detail}')
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main(verbose='-v' in sys.argv[1:])
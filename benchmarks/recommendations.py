@@ -0,0 +1,60 @@
+"""`flask build-recommendations` build time and the cost of GET /recipes/<id>/similar.
+
+    python -m benchmarks.recommendations [recipes] [workers]
+
+Builds the neighbours with one process and with `workers`, with NumPy when it is
+installed and with the pure Python fallback, then compares the precomputed read
+against loading the matrices and scoring one recipe per request.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+from .common import setup_app, synthetic_recipe
+
+
+def main(count=5000, workers=os.cpu_count() or 1):
+    app, db = setup_app()
+    from sqlalchemy import insert
+    from app import recommendations
+    from app.importer import import_recipes
+    from app.models import User, Favorite
+    rng = random.Random(0)
+    with app.app_context():
+        db.session.execute(insert(User), [{'username': f'user{i}', 'email': f'user{i}@example.com', 'password': '-'}
+                                          for i in range(count // 100)])
+        recipe_ids = import_recipes((synthetic_recipe(i) for i in range(count)), chunk_size=1000)['recipe_ids']
+        db.session.execute(insert(Favorite), [{'user_id': user_id, 'recipe_id': recipe_id}
+                                              for user_id in range(1, count // 100 + 1)
+                                              for recipe_id in rng.sample(recipe_ids, 100)])
+        db.session.commit()
+
+        print(f'recipes={count} users={count // 100}')
+        numpy = recommendations.load_numpy()
+        backends = {'numpy': numpy, 'pure python': None} if numpy else {'pure python': None}
+        for name, backend in backends.items():
+            recommendations.load_numpy = lambda: backend
+            for processes in sorted({1, workers}):
+                start = time.perf_counter()
+                report = recommendations.build_recommendations(workers=processes)
+                print(f'build {name:<12} workers={processes:<3} {time.perf_counter() - start:8.2f}s  {report}')
+
+        def on_the_fly(recipe_id):
+            matrices = recommendations.load_matrices()
+            recommendations._start_worker(*matrices, app.config['RECOMMENDATIONS_FAVORITE_WEIGHT'], 10)
+            return recommendations._neighbours([matrices[0].index(recipe_id)])
+
+        for name, func in (('precomputed', lambda recipe_id: recommendations.similar_recipes(recipe_id, 10)),
+                           ('on the fly', on_the_fly)):
+            latencies = []
+            for recipe_id in rng.sample(recipe_ids, 20):
+                start = time.perf_counter()
+                func(recipe_id)
+                latencies.append((time.perf_counter() - start) * 1000)
+            print(f'similar {name:<12} median={statistics.median(latencies):9.2f}ms  max={max(latencies):9.2f}ms')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
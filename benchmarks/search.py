@@ -0,0 +1,33 @@
+"""GET /recipes/search latency over a synthetic corpus.
+
+    python -m benchmarks.search [recipes] [queries]
+"""
+import random
+import statistics
+import sys
+import time
+
+from .common import setup_app, synthetic_recipe, WORDS
+
+
+def main(count=100000, queries=500):
+    app, db = setup_app()
+    from app.importer import import_recipes
+    with app.app_context():
+        import_recipes((synthetic_recipe(i) for i in range(count)), chunk_size=1000)
+    client = app.test_client()
+    rng = random.Random(0)
+    latencies = []
+    for _ in range(queries):
+        q = ' '.join(rng.sample(WORDS, rng.randint(1, 3)))
+        start = time.perf_counter()
+        response = client.get('/recipes/search', query_string={'q': q, 'limit': 20})
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f'recipes={count} queries={queries}')
+    print(f'p50={quantiles[49]:.2f}ms p95={quantiles[94]:.2f}ms p99={quantiles[98]:.2f}ms')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
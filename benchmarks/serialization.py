@@ -0,0 +1,52 @@
+"""JSON encoding of a 1k-recipe payload: Flask's stdlib provider vs FastJSONProvider.
+
+    python -m benchmarks.serialization [seconds]
+
+`encode` times provider.response() on a prebuilt payload, `endpoint` times a full
+GET /recipes?limit=1000 with the response cache turned off.
+"""
+import sys
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+from .common import setup_app, synthetic_recipe
+
+
+def rate(func, seconds):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        func()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main(seconds=3.0):
+    app, db = setup_app()
+    from app.importer import import_recipes
+    from app.json_provider import FastJSONProvider, orjson
+    app.extensions['response_cache'].enabled = False
+    with app.app_context():
+        import_recipes(synthetic_recipe(i) for i in range(1000))
+    client = app.test_client()
+    payload = client.get('/recipes?limit=1000&expand=ingredients,directions').json
+
+    fast = FastJSONProvider(app)
+    providers = {'stdlib (flask default)': DefaultJSONProvider(app)}
+    fast.use_orjson = False
+    providers['FastJSONProvider stdlib'] = fast
+    if orjson is not None:
+        providers['FastJSONProvider orjson'] = FastJSONProvider(app)
+        providers['FastJSONProvider orjson'].use_orjson = True
+
+    for name, provider in providers.items():
+        app.json = provider
+        with app.app_context():
+            encode = rate(lambda: provider.response(payload), seconds)
+        endpoint = rate(lambda: client.get('/recipes?limit=1000'), seconds)
+        print(f'{name:<26} encode={encode:8.1f}/s  endpoint={endpoint:6.1f} responses/s')
+
+
+if __name__ == '__main__':
+    main(*map(float, sys.argv[1:]))
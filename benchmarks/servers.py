@@ -0,0 +1,44 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from contextlib import contextmanager
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+SERVERS = {
+    'gunicorn-sync': lambda port, workers: [sys.executable, '-m', 'gunicorn', '-w', str(workers),
+                                            '-b', f'127.0.0.1:{port}', 'wsgi:app'],
+    'uvicorn-asgi': lambda port, workers: [sys.executable, '-m', 'uvicorn', '--workers', str(workers),
+                                           '--port', str(port), '--log-level', 'warning', 'app.asgi:application'],
+}
+
+
+@contextmanager
+def running_server(kind, workers=1, timeout=30):
+    """Start a server on the benchmark database (DATABASE_URL is inherited) and yield its base URL."""
+    port = free_port()
+    process = subprocess.Popen(SERVERS[kind](port, workers), env=os.environ.copy(),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                urllib.request.urlopen(base_url + '/cache/stats', timeout=1).read()
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f'{kind} did not start')
+                time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
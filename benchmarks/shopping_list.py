@@ -0,0 +1,77 @@
+"""POST /shopping-list merging 1k recipes, against clients fetching each recipe and summing row by row.
+
+    python -m benchmarks.shopping_list [recipes] [rounds]
+
+`sum` times the batched sum of the already loaded rows alone, with NumPy when it
+is installed and with the pure Python fallback.
+"""
+import random
+import statistics
+import sys
+import time
+
+from .common import setup_app, synthetic_recipe
+
+UNITS = ('g', 'kg', 'oz', 'lb', 'ml', 'tsp', 'tbsp', 'cups', 'cloves', '')
+
+
+def recipe_with_units(i):
+    recipe = synthetic_recipe(i)
+    rng = random.Random(i)
+    for ingredient in recipe['ingredients']:
+        ingredient['units'] = rng.choice(UNITS)
+    return recipe
+
+
+def timed(func, rounds):
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies), max(latencies)
+
+
+def main(count=1000, rounds=20):
+    app, db = setup_app()
+    from app import shopping
+    from app.importer import import_recipes
+    with app.app_context():
+        recipe_ids = import_recipes(recipe_with_units(i) for i in range(count))['recipe_ids']
+    rng = random.Random(0)
+    body = {'recipes': [{'recipe_id': recipe_id, 'multiplier': rng.choice((0.5, 1, 2, 4))} for recipe_id in recipe_ids]}
+    client = app.test_client()
+
+    def endpoint():
+        response = client.post('/shopping-list', json=body)
+        assert response.status_code == 200, response.json
+
+    def row_by_row():
+        totals = {}
+        for item in body['recipes']:
+            recipe = client.get(f"/recipes/{item['recipe_id']}?expand=ingredients").json
+            for ingredient in recipe['ingredients']:
+                key = (ingredient['name'].lower(), ingredient['units'])
+                totals[key] = totals.get(key, 0) + ingredient['quantity'] * item['multiplier']
+
+    rng = random.Random(1)
+    size = 200
+    keys = [rng.randrange(size) for _ in range(count * 8)]
+    quantities = [rng.uniform(1, 500) for _ in keys]
+    scales = [rng.choice((0.5, 1, 2, 4)) * rng.choice((1, 1000, 28.35, 4.93)) for _ in keys]
+
+    print(f'recipes={count} ingredient rows={count * 8} rounds={rounds}')
+    median, worst = timed(endpoint, rounds)
+    print(f'{"POST /shopping-list":<26} median={median:8.2f}ms  max={worst:8.2f}ms')
+    median, worst = timed(row_by_row, max(rounds // 10, 1))
+    print(f'{"GET each recipe":<26} median={median:8.2f}ms  max={worst:8.2f}ms')
+    numpy = shopping.load_numpy()
+    backends = {'sum numpy': numpy, 'sum pure python': None} if numpy else {'sum pure python': None}
+    for name, backend in backends.items():
+        shopping.load_numpy = lambda: backend
+        median, worst = timed(lambda: shopping.sum_by_key(keys, quantities, scales, size), rounds)
+        print(f'{name:<26} median={median:8.2f}ms  max={worst:8.2f}ms')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,104 @@
+"""Worker boot latency: import time by package, time to first request, gunicorn ready time.
+
+    python -m benchmarks.startup [runs] [workers]
+
+Every measurement is a fresh interpreter, the median of `runs`. `import` sums the
+self times of `python -X importtime -c "import wsgi"` by top-level package; `first request`
+times a new process from `from app import create_app` to the first GET /recipes
+through the test client; `gunicorn` is spawn to first answered request, with and
+without GUNICORN_PRELOAD.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from .common import setup_app, synthetic_recipe
+from .servers import SERVERS, free_port
+
+FIRST_REQUEST = '''
+import json, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+client = app.test_client()
+client.get('/recipes').get_data()
+first = time.perf_counter()
+client.get('/recipes').get_data()
+second = time.perf_counter()
+print(json.dumps({'import': imported - started, 'create_app': created - imported,
+                  'first request': first - created, 'second request': second - first}))
+'''
+
+
+def import_times():
+    """{top-level package: seconds spent in its own modules} for importing the WSGI entry point."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import wsgi'],
+                            capture_output=True, text=True, check=True).stderr
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_time) / 1e6
+    return packages
+
+
+def first_request():
+    return json.loads(subprocess.run([sys.executable, '-c', FIRST_REQUEST],
+                                     capture_output=True, text=True, check=True).stdout)
+
+
+def gunicorn_ready(workers, preload):
+    port = free_port()
+    env = dict(os.environ, GUNICORN_PRELOAD='1' if preload else '0')
+    started = time.perf_counter()
+    process = subprocess.Popen(SERVERS['gunicorn-sync'](port, workers), env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/recipes', timeout=1).read()
+                return time.perf_counter() - started
+            except OSError:
+                if process.poll() is not None:
+                    raise RuntimeError('gunicorn did not start')
+                time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def median_of(runs, measure):
+    samples = [measure() for _ in range(runs)]
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def main(runs=5, workers=2):
+    app, db = setup_app()
+    from app.importer import import_recipes
+    with app.app_context():
+        import_recipes(synthetic_recipe(i) for i in range(100))
+        db.engine.dispose()
+
+    packages = median_of(runs, import_times)
+    print(f"import wsgi {sum(packages.values()) * 1000:8.1f}ms")
+    for package, seconds in sorted(packages.items(), key=lambda item: -item[1])[:12]:
+        print(f'    {package:<20} {seconds * 1000:8.1f}ms')
+
+    for phase, seconds in median_of(runs, first_request).items():
+        print(f'{phase:<15} {seconds * 1000:8.1f}ms')
+
+    for preload in (False, True):
+        ready = statistics.median(gunicorn_ready(workers, preload) for _ in range(runs))
+        print(f"gunicorn workers={workers} preload={'on ' if preload else 'off'} ready in {ready * 1000:8.1f}ms")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
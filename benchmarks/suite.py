@@ -0,0 +1,275 @@
+"""p50/p95/p99 latency and RPS of every route in app/routes.py on a synthetic dataset.
+
+    python -m benchmarks.suite [--scale 10k] [--seed 1] [--requests 200] [--target client|gunicorn|all]
+                               [--workers 2] [--concurrency 8] [--output FILE]
+                               [--compare] [--baseline FILE] [--save-baseline] [--tolerance 0.25]
+
+Each route gets the same number of requests, built from the seed, first through
+the Flask test client (one at a time, no network) and then over HTTP against a
+gunicorn process with `--concurrency` client threads. Results are written as
+JSON. With --compare (or --baseline FILE) every route is compared to a baseline
+(default benchmarks/baselines/<scale>.json) and the run exits non-zero when a p95
+or RPS moved by more than `--tolerance` in the wrong direction. Baselines are
+machine specific: the checked-in one only documents the machine it was recorded
+on, re-record with --save-baseline on the machine that compares against it.
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+
+from .common import WORDS, synthetic_recipe
+from .dataset import SCALES, PASSWORD, use_dataset, user_email, add_throwaway_users
+from .servers import running_server
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+
+
+def build_plan(app, db, seed, count, tag):
+    """[(endpoint, [(method, path, headers, json)])] in run order, after creating what the writes consume.
+
+    `tag` (the target) seeds the plan's random choices along with `seed`.
+    """
+    from sqlalchemy import select, func
+    from app.importer import import_recipes
+    from app.models import User, Recipe
+
+    rng = random.Random(f'{seed}-{tag}')
+    with app.app_context():
+        recipe_count = db.session.scalar(select(func.max(Recipe.recipe_id)))
+        user_count = db.session.scalar(select(func.max(User.user_id)))
+        own_recipes = db.session.scalars(select(Recipe.recipe_id).where(Recipe.user_id == 1)).all()
+        doomed_recipes = import_recipes((synthetic_recipe(i, rng) for i in range(count)), user_id=1)['recipe_ids']
+        doomed_tokens = add_throwaway_users(db, count)
+    token = {'Authorization': 'Bearer bench-token-1'}
+    basic = {'Authorization': 'Basic ' + base64.b64encode(f'{user_email(1)}:{PASSWORD}'.encode()).decode()}
+    some_recipes = [rng.randint(1, recipe_count) for _ in range(count)]
+    toggled = rng.sample(range(1, recipe_count + 1), count)
+    recipe_pages = ('/recipes?limit=50&cursor={}', '/recipes?limit=50&cursor={}&fields=title,cook_time',
+                    '/recipes?limit=20&cursor={}&expand=ingredients,directions')
+    user_pages = ('/users/{}/recipes?limit=20', '/users/{}/recipes?limit=20&sort=-created_at',
+                  '/users/{}/recipes?limit=20&sort=total_time&total_time_max=60')
+
+    def each(make):
+        return [make(i) for i in range(count)]
+
+    return [
+        ('index', each(lambda i: ('GET', '/', {}, None))),
+        ('get_token', each(lambda i: ('GET', '/token', basic, None))),
+        ('get_me', each(lambda i: ('GET', '/users/me', token, None))),
+        ('get_user', each(lambda i: ('GET', f'/users/{rng.randint(1, user_count)}', token, None))),
+        ('get_recommendations', each(lambda i: ('GET', '/users/me/recommendations?limit=20', token, None))),
+        ('update_user', each(lambda i: ('PUT', '/users/me', token, {'username': f'user1-{tag}-{i}'}))),
+        ('get_recipes', each(lambda i: ('GET', recipe_pages[i % 3].format(rng.randint(0, recipe_count)), {}, None))),
+        ('get_user_recipes', each(lambda i: ('GET', user_pages[i % 3].format(rng.randint(1, user_count)), {}, None))),
+        ('search_recipes', each(lambda i: ('GET', f'/recipes/search?q={rng.choice(WORDS)}+{rng.choice(WORDS)}', {}, None))),
+        ('get_recipes_by_ingredients', each(lambda i: (
+            'GET', f"/recipes/by-ingredients?have={','.join(rng.sample(WORDS, 6))}&missing_max=2", {}, None))),
+        ('get_popular_recipes', each(lambda i: ('GET', f'/recipes/popular?limit={rng.choice((10, 50))}', {}, None))),
+        ('build_shopping_list', each(lambda i: ('POST', '/shopping-list', {}, {'recipes': [
+            {'recipe_id': rng.randint(1, recipe_count), 'multiplier': rng.choice((0.5, 1, 2, 4))} for _ in range(20)]}))),
+        ('get_similar_recipes', each(lambda i: ('GET', f'/recipes/{some_recipes[i]}/similar?limit=10', {}, None))),
+        ('get_recipe', each(lambda i: (
+            'GET', f"/recipes/{some_recipes[i]}{'?expand=ingredients,directions' if i % 2 else ''}", {}, None))),
+        ('create_recipe', each(lambda i: ('POST', '/recipes', {}, synthetic_recipe(i, rng)))),
+        ('bulk_create_recipes', each(lambda i: ('POST', '/recipes/bulk', token, [synthetic_recipe(j, rng) for j in range(10)]))),
+        ('update_recipe', each(lambda i: ('PUT', f'/recipes/{own_recipes[i % len(own_recipes)]}', token, {'title': f'Renamed {tag} {i}'}))),
+        ('delete_recipe', each(lambda i: ('DELETE', f'/recipes/{doomed_recipes[i]}', token, None))),
+        ('get_favorites', each(lambda i: ('GET', '/favorites', token, None))),
+        ('toggle_favorite', each(lambda i: ('POST', f'/favorites/{toggled[i]}', token, None))),
+        ('remove_favorite', each(lambda i: ('DELETE', f'/favorites/{toggled[i]}', token, None))),
+        ('batch_favorites', each(lambda i: ('POST', '/favorites/batch', token, [
+            {'recipe_id': rng.randint(1, recipe_count), 'is_favorite': rng.random() < 0.7} for _ in range(20)]))),
+        ('get_cache_stats', each(lambda i: ('GET', '/cache/stats', {}, None))),
+        ('get_metrics', each(lambda i: ('GET', '/metrics', {}, None))),
+        ('delete_user', each(lambda i: ('DELETE', '/users/me', {'Authorization': f'Bearer {doomed_tokens[i]}'}, None))),
+    ]
+
+
+def summarize(latencies, statuses, elapsed):
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'errors': sum(count for status, count in statuses.items() if status >= 500),
+        'status': {str(status): count for status, count in sorted(statuses.items())},
+        'p50_ms': round(cuts[49] * 1000, 3),
+        'p95_ms': round(cuts[94] * 1000, 3),
+        'p99_ms': round(cuts[98] * 1000, 3),
+        'rps': round(len(latencies) / elapsed, 1),
+    }
+
+
+def run_client(app, plan):
+    client = app.test_client()
+    results = {}
+    for endpoint, requests in plan:
+        latencies, statuses = [], {}
+        started = time.perf_counter()
+        for method, path, headers, body in requests:
+            request_started = time.perf_counter()
+            response = client.open(path, method=method, headers=headers, json=body)
+            response.get_data()
+            response.close()
+            latencies.append(time.perf_counter() - request_started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        results[endpoint] = summarize(latencies, statuses, time.perf_counter() - started)
+    return results
+
+
+def http_request(base_url, method, path, headers, body):
+    data = None
+    if body is not None:
+        data = json.dumps(body).encode()
+        headers = {**headers, 'Content-Type': 'application/json'}
+    request = urllib.request.Request(base_url + path, data=data, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+
+
+def run_http(base_url, plan, concurrency):
+    results = {}
+    for endpoint, requests in plan:
+        latencies, statuses = [], {}
+        lock = threading.Lock()
+        pending = iter(requests)
+
+        def client():
+            while True:
+                with lock:
+                    request = next(pending, None)
+                if request is None:
+                    return
+                request_started = time.perf_counter()
+                try:
+                    status = http_request(base_url, *request)
+                except OSError:
+                    status = 599
+                elapsed = time.perf_counter() - request_started
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results[endpoint] = summarize(latencies, statuses, time.perf_counter() - started)
+    return results
+
+
+def check_coverage(app, plan):
+    from app import view_name
+    routes = {view_name(rule.endpoint) for rule in app.url_map.iter_rules() if rule.endpoint != 'static'}
+    missing = sorted(routes - {endpoint for endpoint, _ in plan})
+    if missing:
+        raise SystemExit(f"routes not driven by benchmarks/suite.py: {', '.join(missing)}")
+
+
+def compare(report, baseline, tolerance):
+    """Print p95/RPS against the baseline; returns the regressions."""
+    regressions = []
+    print(f"\n{'target':<9} {'endpoint':<27} {'p95 ms':>9} {'base':>9} {'rps':>8} {'base':>8}")
+    for target, results in report['results'].items():
+        for endpoint, result in results.items():
+            base = baseline.get('results', {}).get(target, {}).get(endpoint)
+            if base is None:
+                print(f"{target:<9} {endpoint:<27} {result['p95_ms']:>9.2f} {'-':>9} {result['rps']:>8.1f} {'-':>8}  not in baseline")
+                continue
+            slower = result['p95_ms'] > base['p95_ms'] * (1 + tolerance)
+            fewer = result['rps'] < base['rps'] * (1 - tolerance)
+            flag = '  REGRESSION' if slower or fewer else ''
+            print(f"{target:<9} {endpoint:<27} {result['p95_ms']:>9.2f} {base['p95_ms']:>9.2f} "
+                  f"{result['rps']:>8.1f} {base['rps']:>8.1f}{flag}")
+            if flag:
+                regressions.append((target, endpoint))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=200, help='requests per route and target')
+    parser.add_argument('--target', choices=('client', 'gunicorn', 'all'), default='all')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--concurrency', type=int, default=8, help='HTTP client threads')
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', action='store_true', help='compare with the baseline, exit non-zero on regressions')
+    parser.add_argument('--baseline', help='baseline file (implies --compare)')
+    parser.add_argument('--save-baseline', action='store_true', help='also write the results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    # GET /metrics is a route like the others; the servers inherit this
+    os.environ.setdefault('METRICS_ENABLED', '1')
+    targets = ('client', 'gunicorn') if args.target == 'all' else (args.target,)
+    report = {
+        'meta': {
+            'scale': args.scale, 'seed': args.seed, 'requests': args.requests,
+            'workers': args.workers, 'concurrency': args.concurrency,
+            'commit': git_commit(), 'python': platform.python_version(), 'machine': platform.machine(),
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        },
+        'results': {},
+    }
+    for target in targets:
+        # Each target gets its own copy of the dataset: the previous target's deletes
+        # and favorite toggles would otherwise turn this one's reads into 404s
+        app, db = use_dataset(args.scale, args.seed)
+        plan = build_plan(app, db, args.seed, args.requests, target)
+        check_coverage(app, plan)
+        if target == 'client':
+            report['results'][target] = run_client(app, plan)
+        else:
+            with running_server('gunicorn-sync', args.workers) as base_url:
+                report['results'][target] = run_http(base_url, plan, args.concurrency)
+        print(f"\n{target}: {'endpoint':<27} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>8}  status")
+        for endpoint, result in report['results'][target].items():
+            print(f"{'':<{len(target) + 2}}{endpoint:<27} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                  f"{result['p99_ms']:>8.2f} {result['rps']:>8.1f}  {result['status']}")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'\nwrote {args.output}')
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f'{args.scale}.json')
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'wrote baseline {baseline_path}')
+    elif args.compare or args.baseline:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('machine') != report['meta']['machine'] or baseline['meta'].get('requests') != args.requests:
+            print(f"\nnote: baseline recorded with {baseline['meta'].get('requests')} requests on {baseline['meta'].get('machine')}")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            raise SystemExit(f'{len(regressions)} regressions against {baseline_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,165 @@
 
-from flask_sqlalchemy import SQLAlchemy
 import os
 
-db = SQLAlchemy()
-
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+database_url = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'app.db')
+# Some hosts still hand out postgres:// URLs, which SQLAlchemy 2 no longer accepts
+if database_url.startswith('postgres://'):
+    database_url = database_url.replace('postgres://', 'postgresql://', 1)
+
+
+# Engine options per database backend, picked from the DATABASE_URL scheme
+ENGINE_PROFILES = {
+    # In-memory SQLite lives on a single connection, pool options don't apply
+    'sqlite-memory': {},
+    'sqlite': {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    },
+    'postgresql': {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),  # in seconds
+    },
+}
+
+
+def engine_profile(url):
+    if url.startswith('sqlite'):
+        return 'sqlite-memory' if url in ('sqlite://', 'sqlite:///:memory:') else 'sqlite'
+    return url.split(':', 1)[0].split('+', 1)[0]
+
+
 class Config:
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'app.db')
\ No newline at end of file
+    SQLALCHEMY_DATABASE_URI = database_url
+    SQLALCHEMY_ENGINE_OPTIONS = ENGINE_PROFILES.get(engine_profile(database_url), {})
+    # Applied to every new SQLite connection. WAL lets readers run alongside the
+    # writer, busy_timeout waits for the write lock instead of "database is locked".
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # in milliseconds
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),  # in bytes
+        'cache_size': -int(os.environ.get('SQLITE_CACHE_KB', 64 * 1024)),  # negative = KiB
+    }
+
+    # GET /recipes pagination & streaming
+    RECIPES_PAGE_SIZE = int(os.environ.get('RECIPES_PAGE_SIZE', 50))
+    RECIPES_MAX_PAGE_SIZE = int(os.environ.get('RECIPES_MAX_PAGE_SIZE', 1000))
+    RECIPES_YIELD_PER = int(os.environ.get('RECIPES_YIELD_PER', 500))
+
+    # token_auth verification cache (per worker)
+    TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+    TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 300))  # in seconds
+
+    # Password hashing, see werkzeug.security.generate_password_hash. Stored hashes
+    # whose method differs from PASSWORD_HASH_METHOD are rehashed on the next login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH', 16))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 8))  # logins allowed to wait for a worker
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 2))  # in seconds
+
+    # POST /recipes/bulk and `flask import-recipes`
+    BULK_IMPORT_CHUNK_SIZE = int(os.environ.get('BULK_IMPORT_CHUNK_SIZE', 500))
+
+    # POST /favorites/batch: most operations accepted in one request
+    FAVORITES_BATCH_MAX_SIZE = int(os.environ.get('FAVORITES_BATCH_MAX_SIZE', 1000))
+
+    # POST /shopping-list: most recipes merged in one request
+    SHOPPING_LIST_MAX_RECIPES = int(os.environ.get('SHOPPING_LIST_MAX_RECIPES', 1000))
+
+    # GET /recipes/by-ingredients in-memory index; rebuilt from the database after
+    # this many seconds to pick up writes made by other workers
+    INGREDIENT_INDEX_MAX_AGE = int(os.environ.get('INGREDIENT_INDEX_MAX_AGE', 300))  # in seconds
+
+    # GET /recipes/<id>/similar and GET /users/me/recommendations, precomputed by
+    # `flask build-recommendations`: neighbours stored per recipe and user, and the share
+    # of a recipe's similarity that comes from co-favorites rather than shared ingredients
+    RECOMMENDATIONS_SIZE = int(os.environ.get('RECOMMENDATIONS_SIZE', 50))
+    RECOMMENDATIONS_FAVORITE_WEIGHT = float(os.environ.get('RECOMMENDATIONS_FAVORITE_WEIGHT', 0.5))
+
+    # Cache-Control sent on 200/304 responses, keyed by endpoint name
+    CACHE_CONTROL = {
+        'get_recipes': 'public, max-age=30',
+        'get_user_recipes': 'public, max-age=30',
+        'get_recipe': 'public, max-age=60',
+        'get_similar_recipes': 'public, max-age=300',
+        'get_recommendations': 'private, max-age=300',
+        'get_favorites': 'private, no-cache',
+    }
+
+    # Response compression (app/compression.py), negotiated from Accept-Encoding: gzip and
+    # deflate, plus br / zstd when the brotli / zstandard packages are installed. Bodies under
+    # COMPRESSION_MIN_SIZE bytes go out as they are. Levels are on gzip's 1-9 scale, set per
+    # endpoint in COMPRESSION_LEVELS (0 = never compress); cached responses are compressed
+    # once per cache entry, so they can afford a higher level than streamed or uncached ones
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', '1') == '1'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))  # in bytes
+    COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+    COMPRESSION_LEVELS = {
+        'get_recipes': 6,
+        'get_user_recipes': 9,
+        'get_recipe': 9,
+        'get_favorites': 9,
+        'search_recipes': 4,
+        'build_shopping_list': 4,
+        'get_metrics': 1,
+    }
+
+    # Response cache for recipe reads. RESPONSE_CACHE_BACKEND is the dotted path of an
+    # app.cache.CacheBackend subclass, created with RESPONSE_CACHE_OPTIONS as kwargs.
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'app.cache.MemoryBackend')
+    # Writes only invalidate the cache of the worker that made them, so the per-process
+    # MemoryBackend is off unless asked for (safe with a single worker); shared backends default on
+    RESPONSE_CACHE_ENABLED = os.environ.get(
+        'RESPONSE_CACHE_ENABLED', '0' if RESPONSE_CACHE_BACKEND == 'app.cache.MemoryBackend' else '1') == '1'
+    RESPONSE_CACHE_OPTIONS = {'maxsize': 10000, 'ttl': 60}
+
+    # Encode responses with orjson when it is installed
+    JSON_USE_ORJSON = os.environ.get('JSON_USE_ORJSON', '1') == '1'
+
+    # Async serving mode (app/asgi.py); derived from SQLALCHEMY_DATABASE_URI when unset
+    ASYNC_DATABASE_URI = os.environ.get('ASYNC_DATABASE_URL')
+
+    # GET /recipes/popular: how many recipes the in-memory top list keeps, and how
+    # often each worker reloads it from recipe.favorite_count
+    POPULAR_RECIPES_SIZE = int(os.environ.get('POPULAR_RECIPES_SIZE', 100))
+    POPULAR_RECIPES_MAX_AGE = int(os.environ.get('POPULAR_RECIPES_MAX_AGE', 60))  # in seconds
+
+    # Per-request metrics (app/metrics.py), served at GET /metrics in the Prometheus
+    # text format. Each worker keeps its own histograms.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0') == '1'
+    # Adds a Server-Timing header; with METRICS_PROFILE_DIR set, requests slower than
+    # METRICS_PROFILE_THRESHOLD seconds are profiled and dumped there as .pstats files
+    METRICS_DEBUG = os.environ.get('METRICS_DEBUG', '0') == '1'
+    METRICS_PROFILE_DIR = os.environ.get('METRICS_PROFILE_DIR')
+    METRICS_PROFILE_THRESHOLD = float(os.environ.get('METRICS_PROFILE_THRESHOLD', 0.5))
+
+    # Admission control (app/ratelimit.py). RATE_LIMITS are token buckets per client
+    # (bearer token, else remote address): endpoint -> (burst, requests per second).
+    # CONCURRENCY_LIMITS cap each endpoint's requests in progress per worker process.
+    # Refused requests get 429 / 503 with Retry-After. RATE_LIMIT_BACKEND is the dotted
+    # path of an app.ratelimit.BucketStore subclass, created with RATE_LIMIT_OPTIONS.
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'app.ratelimit.MemoryBucketStore')
+    RATE_LIMIT_OPTIONS = {'maxsize': 100000}
+    RATE_LIMITS = {
+        'get_token': (10, 10 / 60),
+        'get_recipes': (120, 20),
+        'get_user_recipes': (120, 20),
+        'create_recipe': (30, 1),
+        'bulk_create_recipes': (5, 0.1),
+        'build_shopping_list': (30, 2),
+    }
+    CONCURRENCY_LIMITS = {
+        'get_token': 4,
+        'get_recipes': 16,
+        'get_user_recipes': 16,
+        'bulk_create_recipes': 2,
+        'build_shopping_list': 4,
+    }
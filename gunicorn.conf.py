@@ -0,0 +1,19 @@
+"""gunicorn settings, read from the working directory by `gunicorn wsgi:app`.
+
+GUNICORN_PRELOAD=1 builds the app once in the master and forks the workers from it:
+they boot without importing anything and share those pages copy-on-write, but a
+code change then needs a restart instead of a HUP.
+"""
+import os
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0') == '1'
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from app import db
+    app = server.app.wsgi()
+    # pooled connections must not be shared across processes: each worker starts with an empty pool
+    with app.app_context():
+        db.engine.dispose(close=False)
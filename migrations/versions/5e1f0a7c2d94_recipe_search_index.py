@@ -0,0 +1,159 @@
+"""Recipe full-text search index, index child recipe_id
+
+Revision ID: 5e1f0a7c2d94
+Revises: 3c9d4e5f6a7b
+Create Date: 2026-10-18 10:41:07.118532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e1f0a7c2d94'
+down_revision = '3c9d4e5f6a7b'
+branch_labels = None
+depends_on = None
+
+
+# FTS5 is SQLite only; keep in sync with app/search.py
+UPGRADE_SQL = [
+    """
+    CREATE VIRTUAL TABLE recipe_search USING fts5(title, tips, ingredients, directions, tokenize = 'porter unicode61')
+    """,
+    """
+    CREATE TRIGGER recipe_search_recipe_ai AFTER INSERT ON recipe BEGIN
+    DELETE FROM recipe_search WHERE rowid = NEW.recipe_id;
+    INSERT INTO recipe_search (rowid, title, tips, ingredients, directions)
+    SELECT recipe.recipe_id, recipe.title, recipe.tips,
+    (SELECT group_concat(name, ' ') FROM ingredient WHERE ingredient.recipe_id = recipe.recipe_id),
+    (SELECT group_concat(instruction, ' ') FROM direction WHERE direction.recipe_id = recipe.recipe_id)
+    FROM recipe WHERE recipe.recipe_id = NEW.recipe_id;
+    END
+    """,
+    """
+    CREATE TRIGGER recipe_search_recipe_au AFTER UPDATE OF title, tips ON recipe BEGIN
+    DELETE FROM recipe_search WHERE rowid = NEW.recipe_id;
+    INSERT INTO recipe_search (rowid, title, tips, ingredients, directions)
+    SELECT recipe.recipe_id, recipe.title, recipe.tips,
+    (SELECT group_concat(name, ' ') FROM ingredient WHERE ingredient.recipe_id = recipe.recipe_id),
+    (SELECT group_concat(instruction, ' ') FROM direction WHERE direction.recipe_id = recipe.recipe_id)
+    FROM recipe WHERE recipe.recipe_id = NEW.recipe_id;
+    END
+    """,
+    """
+    CREATE TRIGGER recipe_search_recipe_ad AFTER DELETE ON recipe BEGIN
+    DELETE FROM recipe_search WHERE rowid = OLD.recipe_id;
+    END
+    """,
+    """
+    CREATE TRIGGER recipe_search_ingredient_ai AFTER INSERT ON ingredient BEGIN
+    DELETE FROM recipe_search WHERE rowid = NEW.recipe_id;
+    INSERT INTO recipe_search (rowid, title, tips, ingredients, directions)
+    SELECT recipe.recipe_id, recipe.title, recipe.tips,
+    (SELECT group_concat(name, ' ') FROM ingredient WHERE ingredient.recipe_id = recipe.recipe_id),
+    (SELECT group_concat(instruction, ' ') FROM direction WHERE direction.recipe_id = recipe.recipe_id)
+    FROM recipe WHERE recipe.recipe_id = NEW.recipe_id;
+    END
+    """,
+    """
+    CREATE TRIGGER recipe_search_ingredient_au AFTER UPDATE ON ingredient BEGIN
+    DELETE FROM recipe_search WHERE rowid = OLD.recipe_id;
+    INSERT INTO recipe_search (rowid, title, tips, ingredients, directions)
+    SELECT recipe.recipe_id, recipe.title, recipe.tips,
+    (SELECT group_concat(name, ' ') FROM ingredient WHERE ingredient.recipe_id = recipe.recipe_id),
+    (SELECT group_concat(instruction, ' ') FROM direction WHERE direction.recipe_id = recipe.recipe_id)
+    FROM recipe WHERE recipe.recipe_id = OLD.recipe_id;
+    DELETE FROM recipe_search WHERE rowid = NEW.recipe_id;
+    INSERT INTO recipe_search (rowid, title, tips, ingredients, directions)
+    SELECT recipe.recipe_id, recipe.title, recipe.tips,
+    (SELECT group_concat(name, ' ') FROM ingredient WHERE ingredient.recipe_id = recipe.recipe_id),
+    (SELECT group_concat(instruction, ' ') FROM direction WHERE direction.recipe_id = recipe.recipe_id)
+    FROM recipe WHERE recipe.recipe_id = NEW.recipe_id;
+    END
+    """,
+    """
+    CREATE TRIGGER recipe_search_ingredient_ad AFTER DELETE ON ingredient BEGIN
+    DELETE FROM recipe_search WHERE rowid = OLD.recipe_id;
+    INSERT INTO recipe_search (rowid, title, tips, ingredients, directions)
+    SELECT recipe.recipe_id, recipe.title, recipe.tips,
+    (SELECT group_concat(name, ' ') FROM ingredient WHERE ingredient.recipe_id = recipe.recipe_id),
+    (SELECT group_concat(instruction, ' ') FROM direction WHERE direction.recipe_id = recipe.recipe_id)
+    FROM recipe WHERE recipe.recipe_id = OLD.recipe_id;
+    END
+    """,
+    """
+    CREATE TRIGGER recipe_search_direction_ai AFTER INSERT ON direction BEGIN
+    DELETE FROM recipe_search WHERE rowid = NEW.recipe_id;
+    INSERT INTO recipe_search (rowid, title, tips, ingredients, directions)
+    SELECT recipe.recipe_id, recipe.title, recipe.tips,
+    (SELECT group_concat(name, ' ') FROM ingredient WHERE ingredient.recipe_id = recipe.recipe_id),
+    (SELECT group_concat(instruction, ' ') FROM direction WHERE direction.recipe_id = recipe.recipe_id)
+    FROM recipe WHERE recipe.recipe_id = NEW.recipe_id;
+    END
+    """,
+    """
+    CREATE TRIGGER recipe_search_direction_au AFTER UPDATE ON direction BEGIN
+    DELETE FROM recipe_search WHERE rowid = OLD.recipe_id;
+    INSERT INTO recipe_search (rowid, title, tips, ingredients, directions)
+    SELECT recipe.recipe_id, recipe.title, recipe.tips,
+    (SELECT group_concat(name, ' ') FROM ingredient WHERE ingredient.recipe_id = recipe.recipe_id),
+    (SELECT group_concat(instruction, ' ') FROM direction WHERE direction.recipe_id = recipe.recipe_id)
+    FROM recipe WHERE recipe.recipe_id = OLD.recipe_id;
+    DELETE FROM recipe_search WHERE rowid = NEW.recipe_id;
+    INSERT INTO recipe_search (rowid, title, tips, ingredients, directions)
+    SELECT recipe.recipe_id, recipe.title, recipe.tips,
+    (SELECT group_concat(name, ' ') FROM ingredient WHERE ingredient.recipe_id = recipe.recipe_id),
+    (SELECT group_concat(instruction, ' ') FROM direction WHERE direction.recipe_id = recipe.recipe_id)
+    FROM recipe WHERE recipe.recipe_id = NEW.recipe_id;
+    END
+    """,
+    """
+    CREATE TRIGGER recipe_search_direction_ad AFTER DELETE ON direction BEGIN
+    DELETE FROM recipe_search WHERE rowid = OLD.recipe_id;
+    INSERT INTO recipe_search (rowid, title, tips, ingredients, directions)
+    SELECT recipe.recipe_id, recipe.title, recipe.tips,
+    (SELECT group_concat(name, ' ') FROM ingredient WHERE ingredient.recipe_id = recipe.recipe_id),
+    (SELECT group_concat(instruction, ' ') FROM direction WHERE direction.recipe_id = recipe.recipe_id)
+    FROM recipe WHERE recipe.recipe_id = OLD.recipe_id;
+    END
+    """,
+    """
+    INSERT INTO recipe_search (rowid, title, tips, ingredients, directions)
+    SELECT recipe.recipe_id, recipe.title, recipe.tips,
+    (SELECT group_concat(name, ' ') FROM ingredient WHERE ingredient.recipe_id = recipe.recipe_id),
+    (SELECT group_concat(instruction, ' ') FROM direction WHERE direction.recipe_id = recipe.recipe_id)
+    FROM recipe
+    """,
+]
+
+TRIGGERS = [
+    'recipe_search_recipe_ai', 'recipe_search_recipe_au', 'recipe_search_recipe_ad',
+    'recipe_search_ingredient_ai', 'recipe_search_ingredient_au', 'recipe_search_ingredient_ad',
+    'recipe_search_direction_ai', 'recipe_search_direction_au', 'recipe_search_direction_ad',
+]
+
+
+def upgrade():
+    # the triggers look children up by recipe_id
+    with op.batch_alter_table('ingredient', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ingredient_recipe_id'), ['recipe_id'], unique=False)
+    with op.batch_alter_table('direction', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_direction_recipe_id'), ['recipe_id'], unique=False)
+
+    if op.get_context().dialect.name != 'sqlite':
+        return
+    for statement in UPGRADE_SQL:
+        op.execute(statement)
+
+
+def downgrade():
+    if op.get_context().dialect.name == 'sqlite':
+        for trigger in TRIGGERS:
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS recipe_search')
+
+    with op.batch_alter_table('direction', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_direction_recipe_id'))
+    with op.batch_alter_table('ingredient', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ingredient_recipe_id'))
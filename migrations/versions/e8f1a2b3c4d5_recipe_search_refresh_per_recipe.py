@@ -0,0 +1,68 @@
+"""Recipe search documents refreshed once per recipe by the app
+
+Revision ID: e8f1a2b3c4d5
+Revises: dc24ee6bbd9e
+Create Date: 2026-10-18 16:12:40.381904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8f1a2b3c4d5'
+down_revision = 'dc24ee6bbd9e'
+branch_labels = None
+depends_on = None
+
+
+# app/search.py now rebuilds a changed recipe's document once per flush (and per import
+# chunk); the per-row triggers rebuilt it for every ingredient and direction written.
+# recipe_search_recipe_ad stays. FTS5 is SQLite only.
+DROPPED_TRIGGERS = [
+    'recipe_search_recipe_ai', 'recipe_search_recipe_au',
+    'recipe_search_ingredient_ai', 'recipe_search_ingredient_au', 'recipe_search_ingredient_ad',
+    'recipe_search_direction_ai', 'recipe_search_direction_au', 'recipe_search_direction_ad',
+]
+
+REFRESH_DOCUMENT = """
+    DELETE FROM recipe_search WHERE rowid = {id};
+    INSERT INTO recipe_search (rowid, title, tips, ingredients, directions)
+    SELECT recipe.recipe_id, recipe.title, recipe.tips,
+    (SELECT group_concat(name, ' ') FROM ingredient WHERE ingredient.recipe_id = recipe.recipe_id),
+    (SELECT group_concat(instruction, ' ') FROM direction WHERE direction.recipe_id = recipe.recipe_id)
+    FROM recipe WHERE recipe.recipe_id = {id};
+"""
+
+
+def downgrade_sql():
+    statements = [
+        "CREATE TRIGGER recipe_search_recipe_ai AFTER INSERT ON recipe BEGIN"
+        + REFRESH_DOCUMENT.format(id='NEW.recipe_id') + "END",
+        "CREATE TRIGGER recipe_search_recipe_au AFTER UPDATE OF title, tips ON recipe BEGIN"
+        + REFRESH_DOCUMENT.format(id='NEW.recipe_id') + "END",
+    ]
+    for child in ('ingredient', 'direction'):
+        statements += [
+            f"CREATE TRIGGER recipe_search_{child}_ai AFTER INSERT ON {child} BEGIN"
+            + REFRESH_DOCUMENT.format(id='NEW.recipe_id') + "END",
+            f"CREATE TRIGGER recipe_search_{child}_au AFTER UPDATE ON {child} BEGIN"
+            + REFRESH_DOCUMENT.format(id='OLD.recipe_id') + REFRESH_DOCUMENT.format(id='NEW.recipe_id') + "END",
+            f"CREATE TRIGGER recipe_search_{child}_ad AFTER DELETE ON {child} BEGIN"
+            + REFRESH_DOCUMENT.format(id='OLD.recipe_id') + "END",
+        ]
+    return statements
+
+
+def upgrade():
+    if op.get_context().dialect.name != 'sqlite':
+        return
+    for trigger in DROPPED_TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+
+
+def downgrade():
+    if op.get_context().dialect.name != 'sqlite':
+        return
+    for statement in downgrade_sql():
+        op.execute(statement)
@@ -0,0 +1,31 @@
+import pytest
+from app import create_app, db
+from config import Config
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Builds apps sharing one SQLite file, each standing in for a separate worker."""
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1'
+        RATE_LIMIT_ENABLED = False
+        METRICS_ENABLED = False
+        RESPONSE_CACHE_ENABLED = False
+
+    def make():
+        app = create_app(TestConfig)
+        with app.app_context():
+            db.create_all()
+        return app
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
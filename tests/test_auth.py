@@ -0,0 +1,27 @@
+from app import db
+from app.models import User, Recipe
+
+
+def create_user(app, username='cook'):
+    with app.app_context():
+        user = User(username=username, email=f'{username}@example.com', password='secret')
+        user.save()
+        recipe = Recipe(title='Toast', cook_time=2, prep_time=1, user_id=user.user_id)
+        db.session.add(recipe)
+        db.session.commit()
+        return recipe.recipe_id
+
+
+def test_deleted_user_token_is_refused_by_other_workers(make_app):
+    first, second = make_app(), make_app()
+    recipe_id = create_user(first)
+    token = first.test_client().get('/token', auth=('cook@example.com', 'secret')).json['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    other_worker = second.test_client()
+    # The second worker caches the token on a read
+    assert other_worker.get('/favorites', headers=headers).status_code == 200
+
+    assert first.test_client().delete('/users/me', headers=headers).status_code == 200
+
+    assert other_worker.post(f'/favorites/{recipe_id}', headers=headers).status_code == 401
+    assert other_worker.post('/recipes/bulk', headers=headers, json=[]).status_code == 401
@@ -0,0 +1,35 @@
+from app import db
+from app.models import User, Recipe
+
+
+def favorite_count(app, recipe_id):
+    with app.app_context():
+        return db.session.get(Recipe, recipe_id).favorite_count
+
+
+def sign_up(app, username):
+    with app.app_context():
+        User(username=username, email=f'{username}@example.com', password='secret').save()
+    token = app.test_client().get('/token', auth=(f'{username}@example.com', 'secret')).json['token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_toggles_and_removals_keep_favorite_count(app, client):
+    with app.app_context():
+        recipe = Recipe(title='Toast', cook_time=2, prep_time=1)
+        db.session.add(recipe)
+        db.session.commit()
+        recipe_id = recipe.recipe_id
+    cook, guest = sign_up(app, 'cook'), sign_up(app, 'guest')
+
+    for headers, expected in ((cook, 1), (guest, 2), (cook, 1), (cook, 2)):
+        assert client.post(f'/favorites/{recipe_id}', headers=headers).status_code == 200
+        assert favorite_count(app, recipe_id) == expected
+
+    assert client.delete(f'/favorites/{recipe_id}', headers=cook).status_code == 200
+    assert client.delete(f'/favorites/{recipe_id}', headers=cook).status_code == 404
+    assert favorite_count(app, recipe_id) == 1
+
+    # A deleted user's favorites stop counting
+    assert client.delete('/users/me', headers=guest).status_code == 200
+    assert favorite_count(app, recipe_id) == 0
@@ -0,0 +1,51 @@
+import threading
+from sqlalchemy import insert
+from app import db
+from app.ingredients import ingredient_index
+from app.models import Recipe, Ingredient
+
+
+def add_recipe(title, *ingredients):
+    recipe = Recipe(title=title, cook_time=1, prep_time=1)
+    recipe.ingredients.extend(Ingredient(name, 1, 'g') for name in ingredients)
+    db.session.add(recipe)
+    db.session.commit()
+    return recipe.recipe_id
+
+
+def test_stale_index_is_rebuilt_in_the_background(app):
+    with app.app_context():
+        toast = add_recipe('Toast', 'bread', 'butter')
+        assert [recipe_id for recipe_id, _ in ingredient_index.match(['bread', 'butter'])] == [toast]
+
+        # A write the index never hears about is only picked up by the periodic rebuild
+        jam = db.session.scalar(insert(Recipe).values(title='Jam toast', cook_time=1, prep_time=1, total_time=2)
+                                      .returning(Recipe.recipe_id))
+        db.session.execute(insert(Ingredient), [{'recipe_id': jam, 'name': name} for name in ('bread', 'butter')])
+        db.session.commit()
+        ingredient_index.max_age = 0
+        before = set(threading.enumerate())
+
+        # The stale index still answers while the rebuild runs
+        assert [recipe_id for recipe_id, _ in ingredient_index.match(['bread', 'butter'])] in ([toast], [toast, jam])
+        for thread in set(threading.enumerate()) - before:
+            thread.join()
+
+        ingredient_index.max_age = 300
+        assert [recipe_id for recipe_id, _ in ingredient_index.match(['bread', 'butter'])] == [toast, jam]
+
+
+def test_changes_during_a_rebuild_survive_the_swap(app):
+    with app.app_context():
+        toast = add_recipe('Toast', 'bread', 'butter')
+        ingredient_index.match(['bread'])
+        ingredient_index.max_age = 0
+        before = set(threading.enumerate())
+        soup = add_recipe('Soup', 'leek')   # marked dirty by the commit
+        ingredient_index.match(['leek'])
+        for thread in set(threading.enumerate()) - before:
+            thread.join()
+
+        ingredient_index.max_age = 300
+        assert [recipe_id for recipe_id, _ in ingredient_index.match(['leek'])] == [soup]
+        assert [recipe_id for recipe_id, _ in ingredient_index.match(['bread', 'butter'])] == [toast]
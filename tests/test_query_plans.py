@@ -0,0 +1,8 @@
+from benchmarks.query_plans import check_plans
+
+
+def test_routes_do_not_scan_indexed_tables(app):
+    statements, covered, failures = check_plans(app)
+
+    assert statements and covered
+    assert failures == []
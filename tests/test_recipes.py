@@ -0,0 +1,90 @@
+import pytest
+from app import db
+from app.models import User, Recipe, Ingredient, Direction
+
+
+@pytest.fixture
+def recipe(app):
+    with app.app_context():
+        user = User(username='cook', email='cook@example.com', password='secret')
+        user.save()
+        recipe = Recipe(title='Toast', cook_time=2, prep_time=1, user_id=user.user_id)
+        recipe.ingredients.extend([Ingredient('Bread', 2, 'slices'), Ingredient('Butter', 1, 'tbsp')])
+        recipe.directions.append(Direction(1, 'Toast the bread', None))
+        db.session.add(recipe)
+        db.session.commit()
+        return recipe.recipe_id, [i.ingredient_id for i in recipe.ingredients]
+
+
+@pytest.fixture
+def headers(client, recipe):
+    token = client.get('/token', auth=('cook@example.com', 'secret')).json['token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def ingredients(app, recipe_id):
+    with app.app_context():
+        rows = db.session.scalars(db.select(Ingredient).where(Ingredient.recipe_id == recipe_id)
+                                  .order_by(Ingredient.ingredient_id))
+        return [(i.ingredient_id, i.name, i.quantity) for i in rows]
+
+
+def test_update_keeps_changes_adds_and_removes_children(app, client, recipe, headers):
+    recipe_id, (bread_id, butter_id) = recipe
+    response = client.put(f'/recipes/{recipe_id}', headers=headers, json={'ingredients': [
+        {'ingredient_id': bread_id, 'name': 'Rye bread', 'quantity': 3, 'units': 'slices'},
+        {'name': 'Jam', 'quantity': 1, 'units': 'tbsp'},
+    ]})
+
+    assert response.status_code == 200
+    kept, added = ingredients(app, recipe_id)
+    assert kept == (bread_id, 'Rye bread', 3)
+    # Butter's row is deleted, Jam gets a new one
+    assert added[0] not in (bread_id, butter_id) and added[1:] == ('Jam', 1)
+
+
+def test_update_rejects_unknown_child_id(app, client, recipe, headers):
+    recipe_id, _ = recipe
+    before = ingredients(app, recipe_id)
+
+    response = client.put(f'/recipes/{recipe_id}', headers=headers, json={'ingredients': [
+        {'ingredient_id': 999, 'name': 'Bread', 'quantity': 2, 'units': 'slices'},
+    ]})
+
+    assert response.status_code == 400
+    assert response.json['error'] == 'Unknown ingredient_id: 999'
+    assert ingredients(app, recipe_id) == before
+
+
+@pytest.mark.parametrize('field, child', [
+    ('ingredients', {'ingredient_id': [1], 'name': 'Bread', 'quantity': 2, 'units': 'slices'}),
+    ('directions', {'direction_id': '1', 'step_number': 1, 'instruction': 'Toast the bread'}),
+])
+def test_update_rejects_wrongly_typed_child_id(client, recipe, headers, field, child):
+    recipe_id, _ = recipe
+
+    response = client.put(f'/recipes/{recipe_id}', headers=headers, json={field: [child]})
+
+    assert response.status_code == 400
+    assert response.json['error'].endswith('must be an integer')
+
+
+def test_create_rejects_child_ids(client, headers):
+    response = client.post('/recipes', json={'title': 'Tea', 'cook_time': 3, 'prep_time': 1, 'ingredients': [
+        {'ingredient_id': 1, 'name': 'Tea', 'quantity': 1, 'units': 'bag'},
+    ]})
+
+    assert response.status_code == 400
+    assert response.json['error'] == 'Unknown ingredient_id: 1'
+
+
+def test_recipe_list_varies_on_accept(app, client, recipe):
+    app.extensions['response_cache'].enabled = True
+    page = client.get('/recipes')
+    cached = client.get('/recipes')
+    not_modified = client.get('/recipes', headers={'If-None-Match': page.headers['ETag']})
+    stream = client.get('/recipes', headers={'Accept': 'application/x-ndjson'})
+
+    assert stream.mimetype == 'application/x-ndjson'
+    for response in (page, cached, not_modified, stream):
+        assert 'Accept' in response.vary
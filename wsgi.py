@@ -0,0 +1,9 @@
+"""WSGI entry point for production servers:
+
+    gunicorn -w 4 wsgi:app
+
+`flask` commands find app.create_app() on their own (FLASK_APP=app).
+"""
+from app import create_app
+
+app = create_app()